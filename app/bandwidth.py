@@ -0,0 +1,62 @@
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# (hora inicial, hora final, limite em bytes/s); a faixa pode virar a meia-noite
+Schedule = Tuple[float, float, float]
+
+
+class BandwidthAllocator:
+    """
+    Divide um orçamento global de banda entre os downloads ativos.
+    Downloads com limite próprio abaixo da parte justa ficam com o próprio
+    limite e a sobra é redistribuída entre os demais (water-filling).
+    """
+
+    def __init__(self, limit: float = 0, schedules: Optional[List[Schedule]] = None):
+        self.limit = limit  # 0 = sem limite global
+        self.schedules: List[Schedule] = list(schedules or [])
+        self.lock = Lock()
+        self._active: Dict[str, Optional[float]] = {}
+
+    def current_budget(self, now: Optional[float] = None) -> float:
+        """Orçamento vigente, considerando as faixas de horário."""
+        t = time.localtime(now)
+        hour = t.tm_hour + t.tm_min / 60.0
+        for start, end, limit in self.schedules:
+            inside = start <= hour < end if start <= end else (hour >= start or hour < end)
+            if inside:
+                return limit
+        return self.limit
+
+    def register(self, download_id: str, cap: Optional[float] = None) -> None:
+        with self.lock:
+            self._active[download_id] = cap or None
+
+    def unregister(self, download_id: str) -> None:
+        with self.lock:
+            self._active.pop(download_id, None)
+
+    def allocations(self) -> Dict[str, Optional[float]]:
+        """Limite atual de cada download ativo (None = sem limite)."""
+        budget = self.current_budget()
+        with self.lock:
+            caps = dict(self._active)
+        if not budget:
+            return caps
+
+        # Os de menor limite próprio são atendidos primeiro
+        ordered = sorted(
+            caps.items(), key=lambda item: item[1] if item[1] else float("inf")
+        )
+        result: Dict[str, Optional[float]] = {}
+        remaining = float(budget)
+        for i, (download_id, cap) in enumerate(ordered):
+            fair = remaining / (len(ordered) - i)
+            value = min(cap, fair) if cap else fair
+            result[download_id] = value
+            remaining -= value
+        return result
+
+    def share(self, download_id: str) -> Optional[float]:
+        return self.allocations().get(download_id)
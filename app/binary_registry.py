@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import subprocess
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from .paths import app_data_dir
+
+
+class BinaryRegistry:
+    """
+    Registro persistente dos binários externos (yt-dlp, ffmpeg). Guarda
+    caminho, versão, mtime e tamanho de cada um e só volta a executar a
+    sondagem quando o arquivo muda.
+    """
+
+    def __init__(self, registry_path: Optional[str] = None):
+        self.registry_path = registry_path or os.path.join(
+            app_data_dir(), "binaries.json"
+        )
+        self.lock = Lock()
+        self._records: Dict[str, Dict[str, Any]] = self._load()
+
+    # ============================================================
+    # PERSISTÊNCIA
+    # ============================================================
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.registry_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        tmp = f"{self.registry_path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._records, f, indent=2)
+            os.replace(tmp, self.registry_path)
+        except OSError:
+            pass
+
+    # ============================================================
+    # SONDAGEM
+    # ============================================================
+    @staticmethod
+    def _resolve(command: str) -> Optional[str]:
+        if os.path.dirname(command):
+            return command if os.path.exists(command) else None
+        return shutil.which(command)
+
+    @staticmethod
+    def _run_probe(command: str, version_args: List[str]) -> Optional[str]:
+        try:
+            proc = subprocess.run(
+                [command] + version_args, capture_output=True, text=True, check=True
+            )
+        except Exception:
+            return None
+        lines = (proc.stdout or proc.stderr or "").strip().splitlines()
+        return lines[0] if lines else ""
+
+    def probe(
+        self, name: str, command: str, version_args: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Verifica se `command` executa; usa o registro se o arquivo não mudou."""
+        resolved = self._resolve(command)
+        if not resolved:
+            return None
+        try:
+            st = os.stat(resolved)
+        except OSError:
+            return None
+
+        key = f"{name}:{resolved}"
+        with self.lock:
+            record = self._records.get(key)
+        if (
+            record
+            and record["mtime"] == st.st_mtime
+            and record["size"] == st.st_size
+            and record["command"] == command
+        ):
+            return record
+
+        version = self._run_probe(command, version_args)
+        if version is None:
+            return None
+        record = {
+            "name": name,
+            "command": command,
+            "path": resolved,
+            "version": version,
+            "mtime": st.st_mtime,
+            "size": st.st_size,
+        }
+        with self.lock:
+            self._records[key] = record
+            self._save()
+        return record
+
+    def lookup(
+        self, name: str, candidates: List[str], version_args: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Primeiro candidato funcional, na ordem de preferência."""
+        for command in candidates:
+            record = self.probe(name, command, version_args)
+            if record:
+                return record
+        return None
+
+    # ============================================================
+    # PREPARO DE ARQUIVOS
+    # ============================================================
+    @staticmethod
+    def ensure_executable(path: str) -> None:
+        if os.path.exists(path) and not os.access(path, os.X_OK):
+            os.chmod(path, 0o755)
+
+    @staticmethod
+    def install_copy(source: str, dest: str) -> bool:
+        """Copia `source` para `dest` apenas se o destino faltar ou estiver diferente."""
+        if not os.path.exists(source):
+            return os.path.exists(dest)
+        try:
+            src_st = os.stat(source)
+            dst_st = os.stat(dest)
+            if dst_st.st_size == src_st.st_size and dst_st.st_mtime >= src_st.st_mtime:
+                BinaryRegistry.ensure_executable(dest)
+                return True
+        except OSError:
+            pass
+        shutil.copy2(source, dest)
+        os.chmod(dest, 0o755)
+        return True
+
+
+_default_registry: Optional[BinaryRegistry] = None
+_default_lock = Lock()
+
+
+def default_registry() -> BinaryRegistry:
+    """Instância compartilhada entre DownloadManager e FFmpegHelper."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = BinaryRegistry()
+        return _default_registry
@@ -0,0 +1,133 @@
+import os
+import json
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+from .paths import app_data_dir
+
+# Campos que só fazem sentido em memória (objetos de processo/thread)
+VOLATILE_KEYS = ("process", "thread")
+
+
+class DownloadJournal:
+    """
+    Diário append-only (JSONL) das transições da fila de downloads.
+    Cada linha é uma operação; ao abrir, o diário é reproduzido e
+    compactado para um snapshot com o estado mais recente de cada item.
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, max_history: int = 200):
+        self.journal_path = journal_path or os.path.join(
+            app_data_dir(), "downloads.jsonl"
+        )
+        self.max_history = max_history
+        self.lock = Lock()
+        self._file = None
+
+    # ============================================================
+    # LEITURA
+    # ============================================================
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Reproduz o diário e retorna (itens, ordem da fila)."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        queue: List[str] = []
+        queue_seq: Optional[int] = None
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Linha truncada por uma queda no meio da escrita
+                        continue
+                    op = record.get("op")
+                    if op == "put":
+                        entry = record["entry"]
+                        entries.pop(entry["id"], None)  # mantém a ordem da última escrita
+                        entries[entry["id"]] = entry
+                    elif op == "remove":
+                        entries.pop(record["id"], None)
+                    elif op == "order":
+                        queue = record["queue"]
+                        queue_seq = record.get("seq")
+        except OSError:
+            pass
+        # Itens reenfileirados depois da ordem gravada (seq maior) não
+        # ficam na posição antiga
+        queue = [
+            i
+            for i in queue
+            if i in entries
+            and (queue_seq is None or (entries[i].get("seq") or 0) <= queue_seq)
+        ]
+        return entries, queue
+
+    # ============================================================
+    # ESCRITA
+    # ============================================================
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        return self._file
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self.lock:
+            try:
+                f = self._open()
+                f.write(data)
+                f.flush()
+            except OSError as e:
+                print(f"[DownloadJournal] Falha ao gravar: {e}")
+
+    @staticmethod
+    def _snapshot(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in entry.items() if k not in VOLATILE_KEYS}
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        self._append([{"op": "put", "entry": self._snapshot(entry)}])
+
+    def put_many(self, entries: List[Dict[str, Any]]) -> None:
+        """Grava vários itens numa única escrita."""
+        if entries:
+            self._append([{"op": "put", "entry": self._snapshot(e)} for e in entries])
+
+    def remove(self, download_id: str) -> None:
+        self._append([{"op": "remove", "id": download_id}])
+
+    def set_order(self, queue: List[str], seq: Optional[int] = None) -> None:
+        """Grava a fila; `seq` é o maior seq de item existente nesse momento."""
+        self._append([{"op": "order", "queue": list(queue), "seq": seq}])
+
+    def compact(self, entries: Dict[str, Dict[str, Any]], queue: List[str]) -> None:
+        """
+        Reescreve o diário com o estado atual. Itens finalizados além de
+        max_history são descartados (também de `entries`).
+        """
+        finished = [
+            i for i, e in entries.items() if e.get("status") in ("completed", "error")
+        ]
+        for download_id in finished[: max(0, len(finished) - self.max_history)]:
+            del entries[download_id]
+        records = [{"op": "put", "entry": self._snapshot(e)} for e in entries.values()]
+        seq = max((e.get("seq") or 0 for e in entries.values()), default=0)
+        records.append({"op": "order", "queue": list(queue), "seq": seq})
+        tmp = f"{self.journal_path}.tmp"
+        with self.lock:
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for r in records:
+                        f.write(json.dumps(r, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                os.replace(tmp, self.journal_path)
+            except OSError as e:
+                print(f"[DownloadJournal] Falha ao compactar: {e}")
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
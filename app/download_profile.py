@@ -0,0 +1,86 @@
+import shutil
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+MIB = 1024 * 1024
+
+# Padrões por tipo de stream. HLS/DASH são fragmentados e ganham com vários
+# fragmentos em paralelo; streams progressivos preferem blocos HTTP grandes.
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "hls": {
+        "concurrent_fragments": 8,
+        "http_chunk_size": None,
+        "buffer_size": 1 * MIB,
+        "external_downloader": None,
+    },
+    "dash": {
+        "concurrent_fragments": 4,
+        "http_chunk_size": 10 * MIB,
+        "buffer_size": 1 * MIB,
+        "external_downloader": None,
+    },
+    "progressive": {
+        "concurrent_fragments": 1,
+        "http_chunk_size": 10 * MIB,
+        "buffer_size": 1 * MIB,
+        "external_downloader": None,
+    },
+}
+
+DASH_HOSTS = ("youtube.com", "youtu.be", "vimeo.com")
+
+
+def detect_stream_type(url: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Estima o tipo de stream pelos metadados, se houver, ou pela URL."""
+    protocol = (metadata or {}).get("protocol") or ""
+    if "m3u8" in protocol:
+        return "hls"
+    if "dash" in protocol or "+" in protocol:
+        return "dash"
+    if protocol.startswith("http"):
+        return "progressive"
+
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if parsed.path.endswith(".m3u8"):
+        return "hls"
+    if parsed.path.endswith(".mpd") or any(host.endswith(h) for h in DASH_HOSTS):
+        return "dash"
+    return "progressive"
+
+
+def build_profile(
+    stream_type: str, overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Perfil de desempenho de um download: padrões do tipo de stream com os
+    ajustes do usuário por cima. `external_downloader="auto"` usa o aria2c
+    se ele estiver no PATH.
+    """
+    profile = dict(DEFAULT_PROFILES.get(stream_type, DEFAULT_PROFILES["progressive"]))
+    profile.update(overrides or {})
+    profile["stream_type"] = stream_type
+    if profile.get("external_downloader") == "auto":
+        profile["external_downloader"] = "aria2c" if shutil.which("aria2c") else None
+    return profile
+
+
+def profile_to_options(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte o perfil nas opções da API do yt-dlp."""
+    opts: Dict[str, Any] = {}
+    if profile.get("concurrent_fragments", 1) > 1:
+        opts["concurrent_fragment_downloads"] = int(profile["concurrent_fragments"])
+    if profile.get("http_chunk_size"):
+        opts["http_chunk_size"] = int(profile["http_chunk_size"])
+    if profile.get("buffer_size"):
+        opts["buffersize"] = int(profile["buffer_size"])
+    downloader = profile.get("external_downloader")
+    if downloader:
+        # HLS continua no downloader nativo, que já baixa fragmentos em paralelo
+        opts["external_downloader"] = {"default": downloader, "m3u8": "native"}
+        if downloader == "aria2c":
+            connections = str(max(4, profile.get("concurrent_fragments", 1)))
+            opts["external_downloader_args"] = {
+                "aria2c": ["-x", connections, "-s", connections, "-k", "1M"]
+            }
+    return opts
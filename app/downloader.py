@@ -1,11 +1,31 @@
 import os
 import re
+import time
+import hashlib
 import uuid
+import itertools
 import threading
 import subprocess
 import shutil
-from typing import Any, Dict, List, Optional, Callable
+from typing import Any, Dict, Iterable, List, Optional, Callable, Set, Union
 from threading import Lock
+from urllib.parse import urlparse
+from .ytdlp_engine import YtDlpEngine, options_to_args
+from .binary_registry import BinaryRegistry, default_registry
+from .download_journal import DownloadJournal
+from .progress_bus import ProgressBus, ProgressRecord
+from .download_profile import build_profile, detect_stream_type, profile_to_options
+from .format_selector import DEFAULT_CONSTRAINTS, fallback_spec, select_format
+from .bandwidth import BandwidthAllocator, Schedule
+from .telemetry import PROGRESS_TEMPLATE_ARGS, TransferTelemetry, parse_progress_line
+from .url_import import load_import_file, normalize_items, url_key
+
+VIDEO_EXTS = ("mp4", "mkv", "webm")
+AUDIO_EXTS = ("mp3", "m4a", "opus", "ogg", "webm")
+# Hash curto da chave de deduplicação no nome do arquivo ("titulo [a1b2c3d4e5].mp4")
+DIGEST_RE = re.compile(r"\[([0-9a-f]{10})\]\.\w+$")
+# Estados em que um item ainda vai gravar o arquivo
+IN_FLIGHT = ("queued", "paused", "downloading", "processing")
 
 
 class DownloadManager:
@@ -20,9 +40,24 @@ class DownloadManager:
         on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
         on_error: Optional[Callable[[Dict[str, Any]], None]] = None,
         on_status: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_progress_batch: Optional[Callable[[List[ProgressRecord]], None]] = None,
+        progress_hz: float = 5.0,
+        max_concurrent: int = 3,
+        max_per_host: int = 2,
+        bandwidth_limit: float = 0,
+        bandwidth_schedules: Optional[List[Schedule]] = None,
+        engine: str = "auto",
+        metadata_provider: Optional[Callable[[str], Dict[str, Any]]] = None,
+        format_constraints: Optional[Dict[str, Any]] = None,
+        transcoder: Optional[Callable[[str, str], Optional[str]]] = None,
+        known_urls: Optional[Callable[[], Iterable[str]]] = None,
+        registry: Optional[BinaryRegistry] = None,
+        journal: Optional[DownloadJournal] = None,
+        persist: bool = True,
     ):
         self.base_dir = base_dir or os.getcwd()
         self.binaries_subdir = binaries_subdir
+        self.registry = registry or default_registry()
 
         # Detecta ambiente
         self.is_android = self._is_android()
@@ -31,6 +66,15 @@ class DownloadManager:
         # Resolve yt-dlp correto
         self.yt_dlp_bin = yt_dlp_bin or self._detect_yt_dlp_path()
 
+        # Backend de execução: "inprocess" reaproveita instâncias de YoutubeDL,
+        # "subprocess" abre um yt-dlp por download. "auto" prefere o primeiro.
+        if engine == "auto":
+            engine = "inprocess" if YtDlpEngine.is_available() else "subprocess"
+        self.engine = engine
+        self._ytdlp_engine = (
+            YtDlpEngine(max_idle=max_concurrent) if engine == "inprocess" else None
+        )
+
         # Diretórios de download
         self.download_dir = download_dir or self._resolve_download_dir()
         self.temp_dir = temp_dir or self._resolve_temp_dir()
@@ -45,6 +89,44 @@ class DownloadManager:
         self.on_complete = on_complete
         self.on_error = on_error
         self.on_status = on_status
+        self.on_progress_batch = on_progress_batch
+
+        # Seleção de formato: metadados (com a lista de formatos) sob demanda
+        self.metadata_provider = metadata_provider
+        self.format_constraints = format_constraints or {}
+
+        # Áudio: por padrão só remuxa o stream nativo; `transcoder(path, formato)`
+        # converte quando um formato específico (ex.: mp3) é pedido
+        self.transcoder = transcoder
+
+        # Links já baixados (biblioteca), para não enfileirar de novo em lote
+        self.known_urls = known_urls
+        # Hash do nome -> arquivos gravados (ver _outputs_locked)
+        self._outputs: Optional[Dict[str, Set[str]]] = None
+        self._outputs_lock = Lock()
+
+        # Progresso agrupado: no máximo progress_hz entregas por segundo
+        self.progress_bus = ProgressBus(self._dispatch_progress, rate_hz=progress_hz)
+        self.telemetry = TransferTelemetry()
+
+        # Agendador: fila por prioridade e limites de concorrência
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_per_host = max(0, int(max_per_host))  # 0 = sem limite
+        self._queue: List[str] = []
+        # Ordem de chegada gravada em cada item: recompõe a fila no _restore
+        # sem gravar a fila inteira a cada item enfileirado
+        self._seq = itertools.count(1)
+        self._active: Set[str] = set()
+        self._host_slots: Dict[str, int] = {}
+
+        # Banda: orçamento global (bytes/s) dividido entre os downloads ativos
+        self.bandwidth = BandwidthAllocator(bandwidth_limit, bandwidth_schedules)
+        self._budget_checked_at = 0.0
+        self._last_budget = self.bandwidth.current_budget()
+
+        # Diário em disco: restaura a fila e retoma downloads interrompidos
+        self.journal = (journal or DownloadJournal()) if persist else None
+        self._restore()
 
     # ==============================================================
     # DETECÇÃO DE AMBIENTE E BINÁRIO
@@ -67,21 +149,19 @@ class DownloadManager:
         # Android usa o binário embutido copiado para pasta executável
         if self._is_android():
             android_bin = os.path.join(self.app_bin_dir, "yt-dlp")
-            if not os.path.exists(android_bin) and os.path.exists(embedded_path):
-                shutil.copy(embedded_path, android_bin)
-                os.chmod(android_bin, 0o755)
+            self.registry.install_copy(embedded_path, android_bin)
             return android_bin
 
-        # Desktop: tenta no PATH
-        try:
-            subprocess.run(["yt-dlp", "--version"], capture_output=True, check=True)
-            return "yt-dlp"
-        except Exception:
-            pass
+        # Desktop: PATH primeiro, depois o embutido (sondagem cacheada entre execuções)
+        record = self.registry.lookup(
+            "yt-dlp", ["yt-dlp", embedded_path], ["--version"]
+        )
+        if record:
+            return record["command"]
 
-        # Se falhar, tenta o embutido
+        # Se a sondagem falhar, ainda tenta o embutido
         if os.path.exists(embedded_path):
-            os.chmod(embedded_path, 0o755)
+            self.registry.ensure_executable(embedded_path)
             return embedded_path
 
         raise FileNotFoundError(
@@ -113,21 +193,127 @@ class DownloadManager:
     # CORE DE DOWNLOADS
     # ==============================================================
 
-    def add_download(
+    def _dedup_key(self, entry: Dict[str, Any]) -> str:
+        """
+        Identifica o mesmo conteúdo no mesmo formato: origem|variante. A
+        origem vem sempre do link (url_key: vídeos do YouTube viram
+        "youtube:<id>"), com ou sem metadados, para que todo caminho de
+        enfileiramento chegue à mesma chave e ao mesmo nome de arquivo.
+        """
+        source = url_key(entry["url"])
+        if entry["only_audio"]:
+            codec = entry["audio_format"] if self._wants_transcode(entry) else "native"
+            variant = f"audio:{codec}"
+        else:
+            c = dict(DEFAULT_CONSTRAINTS)
+            c.update(self.format_constraints)
+            c.update(entry.get("format_constraints") or {})
+            variant = f"video:{c.get('max_height') or 'best'}:{c.get('container') or 'any'}"
+        return f"{source}|{variant}"
+
+    def _assign_key(self, entry: Dict[str, Any]) -> None:
+        entry["dedup_key"] = self._dedup_key(entry)
+        entry["digest"] = hashlib.sha1(entry["dedup_key"].encode("utf-8")).hexdigest()[:10]
+
+    def _output_template(self, entry: Dict[str, Any]) -> str:
+        """
+        Nome do arquivo: título + hash curto da chave de deduplicação. Títulos
+        iguais de vídeos diferentes não colidem, e o mesmo conteúdo sempre
+        cai no mesmo nome.
+        """
+        safe_title = "".join(
+            c for c in entry["title"] if c.isalnum() or c in " ._-"
+        ).strip()[:150]
+        name = f"{safe_title} [{entry['digest']}]" if safe_title else f"[{entry['digest']}]"
+        return os.path.join(self.temp_dir, f"{name}.%(ext)s")
+
+    def _output_exts(self, entry: Dict[str, Any]) -> tuple:
+        if not entry["only_audio"]:
+            return VIDEO_EXTS
+        if self._wants_transcode(entry):
+            return (entry["audio_format"],)
+        return AUDIO_EXTS
+
+    def _outputs_locked(self) -> Dict[str, Set[str]]:
+        """
+        Arquivos finais já gravados, agrupados pelo hash no nome. Os
+        diretórios são varridos uma única vez; depois o mapa é mantido pelos
+        downloads concluídos e pelas mudanças da biblioteca (note_outputs).
+        """
+        if self._outputs is None:
+            self._outputs = {}
+            for folder in {self.download_dir, self.temp_dir}:
+                try:
+                    with os.scandir(folder) as it:
+                        for item in it:
+                            self._note_output_locked(item.path)
+                except OSError:
+                    continue
+        return self._outputs
+
+    def _note_output_locked(self, path: str, removed: bool = False) -> None:
+        match = DIGEST_RE.search(os.path.basename(path))
+        if not match:
+            return
+        if removed:
+            paths = self._outputs.get(match.group(1))
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._outputs[match.group(1)]
+        else:
+            self._outputs.setdefault(match.group(1), set()).add(path)
+
+    def note_outputs(self, delta: Dict[str, List[str]]) -> None:
+        """Aplica um delta da biblioteca ({"updated": [...], "removed": [...]})."""
+        with self._outputs_lock:
+            if self._outputs is None:
+                return  # ainda não carregado: a primeira varredura já verá tudo
+            for path in delta.get("updated", []):
+                self._note_output_locked(path)
+            for path in delta.get("removed", []):
+                self._note_output_locked(path, removed=True)
+
+    def _existing_output(self, entry: Dict[str, Any]) -> Optional[str]:
+        """Arquivo já baixado para a mesma chave (qualquer título), se houver."""
+        exts = self._output_exts(entry)
+        with self._outputs_lock:
+            candidates = list(self._outputs_locked().get(entry["digest"], ()))
+        for path in candidates:
+            if path.rsplit(".", 1)[-1].lower() not in exts:
+                continue
+            if os.path.exists(path):
+                return path
+            # Apagado sem que a biblioteca avisasse (ex.: pasta temporária)
+            with self._outputs_lock:
+                self._note_output_locked(path, removed=True)
+        return None
+
+    def _in_flight_locked(self, key: str, exclude: Optional[str] = None) -> Optional[str]:
+        for other in self.items.values():
+            if (
+                other["id"] != exclude
+                and other.get("dedup_key") == key
+                and other["status"] in IN_FLIGHT
+            ):
+                return other["id"]
+        return None
+
+    def _new_entry(
         self,
         url: str,
         title: str,
         uploader: str,
         thumbnail: str = "",
         only_audio: bool = False,
-    ) -> str:
+        audio_format: Optional[str] = None,
+        priority: int = 0,
+        rate_limit: Optional[float] = None,
+        profile: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        constraints: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         download_id = str(uuid.uuid4())
-        safe_title = (
-            "".join(c for c in title if c.isalnum() or c in " ._-").strip()
-            or download_id
-        )
-        out_template = os.path.join(self.temp_dir, f"{safe_title}.%(ext)s")
-
         entry = {
             "id": download_id,
             "url": url,
@@ -135,106 +321,674 @@ class DownloadManager:
             "uploader": uploader,
             "thumbnail": thumbnail,
             "only_audio": only_audio,
+            "audio_format": audio_format,
             "status": "queued",
             "progress": 0.0,
+            "priority": priority,
+            "rate_limit": rate_limit,
+            "profile": build_profile(detect_stream_type(url), profile),
+            "profile_overrides": profile,
+            "format_constraints": constraints,
+            "format": None,
+            "host": self._host_of(url),
             "process": None,
             "thread": None,
-            "output_template": out_template,
+            "output_template": None,
             "temp_dir": self.temp_dir,
             "error": None,
             "final_path": None,
             "final_dir": self.download_dir,
+            "duration": (metadata or {}).get("duration_seconds"),
+            "seq": next(self._seq),
         }
 
+        self._assign_key(entry)
+        entry["output_template"] = self._output_template(entry)
+
+        if metadata and metadata.get("formats"):
+            self._apply_format(entry, metadata)
+        return entry
+
+    def add_download(
+        self,
+        url: str,
+        title: str,
+        uploader: str,
+        thumbnail: str = "",
+        only_audio: bool = False,
+        audio_format: Optional[str] = None,
+        priority: int = 0,
+        rate_limit: Optional[float] = None,
+        profile: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        constraints: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        entry = self._new_entry(
+            url,
+            title,
+            uploader,
+            thumbnail,
+            only_audio=only_audio,
+            audio_format=audio_format,
+            priority=priority,
+            rate_limit=rate_limit,
+            profile=profile,
+            metadata=metadata,
+            constraints=constraints,
+        )
+        download_id = entry["id"]
+        existing = self._existing_output(entry)
+
         with self.lock:
+            # O mesmo conteúdo já na fila ou baixando: junta-se a ele
+            joined = self._in_flight_locked(entry["dedup_key"])
+            if joined:
+                return joined
             self.items[download_id] = entry
+            if existing:
+                entry["status"] = "completed"
+                entry["progress"] = 100.0
+                entry["final_path"] = existing
+            else:
+                self._enqueue_locked(download_id)
 
-        self.start_download(download_id)
+        if existing:
+            # Já baixado: não busca de novo
+            self._emit_complete(entry)
+            return download_id
+        self._emit_status(entry)
+        self._schedule()
         return download_id
 
+    def add_downloads(
+        self,
+        items: Iterable[Union[str, Dict[str, Any]]],
+        only_audio: bool = False,
+        audio_format: Optional[str] = None,
+        priority: int = 0,
+        skip_existing: bool = True,
+    ) -> List[str]:
+        """
+        Enfileira vários links de uma vez (links soltos ou dicts com url,
+        título, canal, miniatura e, se houver, formatos). Links repetidos,
+        já na fila, já na biblioteca ou com o arquivo já gravado são
+        ignorados. Título e canal que faltarem são preenchidos pelos
+        metadados quando o download começar. Retorna os ids criados, na
+        ordem de entrada.
+        """
+        known: Set[str] = set()
+        if skip_existing and callable(self.known_urls):
+            try:
+                known.update(url_key(u) for u in self.known_urls() if u)
+            except Exception as exc:
+                print(f"[DownloadManager] Biblioteca indisponível: {exc}")
+
+        entries: List[Dict[str, Any]] = []
+        batch_keys: Set[str] = set()
+        for item in normalize_items(items):
+            url = item["url"]
+            if not re.match(r"^https?://", url, re.IGNORECASE):
+                url = "https://" + url
+            key = url_key(url)
+            if key in known:
+                continue
+            entry = self._new_entry(
+                url,
+                item.get("title") or "",
+                item.get("uploader") or "",
+                item.get("thumbnail") or "",
+                only_audio=only_audio,
+                audio_format=audio_format,
+                priority=priority,
+                metadata=item,
+            )
+            if entry["dedup_key"] in batch_keys or (
+                skip_existing and self._existing_output(entry)
+            ):
+                continue
+            batch_keys.add(entry["dedup_key"])
+            entries.append(entry)
+
+        with self.lock:
+            if skip_existing:
+                queued = {
+                    e.get("dedup_key")
+                    for e in self.items.values()
+                    if e["status"] in IN_FLIGHT
+                }
+                entries = [e for e in entries if e["dedup_key"] not in queued]
+            for entry in entries:
+                self.items[entry["id"]] = entry
+            self._enqueue_many_locked([entry["id"] for entry in entries])
+
+        if not entries:
+            return []
+        # Uma única escrita no diário para o lote inteiro
+        if self.journal is not None:
+            self.journal.put_many(entries)
+        if callable(self.on_status):
+            for entry in entries:
+                try:
+                    self.on_status(dict(entry))
+                except Exception:
+                    pass
+        self._schedule()
+        return [entry["id"] for entry in entries]
+
+    def import_urls(self, path: str, **kwargs) -> List[str]:
+        """Enfileira os links de um arquivo de texto ou JSON (ver add_downloads)."""
+        return self.add_downloads(load_import_file(path), **kwargs)
+
     def start_download(self, download_id: str) -> None:
+        """Recoloca na fila um item pausado ou com erro e tenta agendar."""
         with self.lock:
             entry = self.items.get(download_id)
-            if not entry or entry["status"] in ("downloading", "completed"):
+            if not entry or entry["status"] in ("downloading", "processing", "completed"):
+                return
+            if self._in_flight_locked(entry.get("dedup_key"), exclude=download_id):
+                # Outro item já vai gravar o mesmo arquivo
                 return
-            entry["status"] = "downloading"
+            changed = entry["status"] != "queued"
+            entry["status"] = "queued"
+            entry["error"] = None
+            if download_id not in self._queue:
+                # Volta para o fim da sua prioridade, também no _restore
+                entry["seq"] = next(self._seq)
+                self._enqueue_locked(download_id)
+                changed = True
+        if changed:
+            self._emit_status(entry)
+        self._schedule()
+
+    # ==============================================================
+    # AGENDADOR
+    # ==============================================================
+
+    def _host_of(self, url: str) -> str:
+        try:
+            return (urlparse(url).hostname or "").lower()
+        except Exception:
+            return ""
+
+    def _enqueue_locked(self, download_id: str) -> None:
+        """Insere na fila respeitando a prioridade (maior primeiro, FIFO no empate)."""
+        priority = self.items[download_id]["priority"]
+        index = len(self._queue)
+        for i, other_id in enumerate(self._queue):
+            if self.items[other_id]["priority"] < priority:
+                index = i
+                break
+        self._queue.insert(index, download_id)
+
+    def _enqueue_many_locked(self, download_ids: List[str]) -> None:
+        """Como _enqueue_locked, mas uma varredura da fila por prioridade do lote."""
+        by_priority: Dict[int, List[str]] = {}
+        for download_id in download_ids:
+            by_priority.setdefault(self.items[download_id]["priority"], []).append(
+                download_id
+            )
+        for priority in sorted(by_priority, reverse=True):
+            index = len(self._queue)
+            for i, other_id in enumerate(self._queue):
+                if self.items[other_id]["priority"] < priority:
+                    index = i
+                    break
+            self._queue[index:index] = by_priority[priority]
+
+    def _schedule(self) -> None:
+        """Inicia os itens da fila enquanto houver vagas livres."""
+        to_start = []
+        with self.lock:
+            for download_id in list(self._queue):
+                if len(self._active) >= self.max_concurrent:
+                    break
+                entry = self.items.get(download_id)
+                if entry is None:
+                    self._queue.remove(download_id)
+                    continue
+                if entry["status"] != "queued":
+                    continue
+                host = entry["host"]
+                if self.max_per_host and (
+                    self._host_slots.get(host, 0) >= self.max_per_host
+                ):
+                    continue
+                self._queue.remove(download_id)
+                self._active.add(download_id)
+                self._host_slots[host] = self._host_slots.get(host, 0) + 1
+                entry["status"] = "downloading"
+                self.bandwidth.register(download_id, entry.get("rate_limit"))
+                to_start.append(entry)
+
+        if to_start:
+            self._rebalance()
+        for entry in to_start:
+            self._emit_status(entry)
+            t = threading.Thread(
+                target=self._download_worker, args=(entry["id"],), daemon=True
+            )
+            entry["thread"] = t
+            t.start()
+
+    def _release_slot(self, download_id: str) -> None:
+        with self.lock:
+            if download_id not in self._active:
+                return
+            self._active.discard(download_id)
+            host = self.items[download_id]["host"]
+            remaining = self._host_slots.get(host, 1) - 1
+            if remaining > 0:
+                self._host_slots[host] = remaining
+            else:
+                self._host_slots.pop(host, None)
+        self.bandwidth.unregister(download_id)
+        self._rebalance()
+        self._schedule()
+
+    def set_max_concurrent(self, value: int) -> None:
+        with self.lock:
+            self.max_concurrent = max(1, int(value))
+        self._schedule()
+
+    def set_max_per_host(self, value: int) -> None:
+        with self.lock:
+            self.max_per_host = max(0, int(value))
+        self._schedule()
+
+    # ==============================================================
+    # BANDA
+    # ==============================================================
+
+    def set_bandwidth_limit(
+        self, limit: float, schedules: Optional[List[Schedule]] = None
+    ) -> None:
+        """Define o orçamento global (bytes/s, 0 = sem limite) e as faixas de horário."""
+        self.bandwidth.limit = limit
+        if schedules is not None:
+            self.bandwidth.schedules = list(schedules)
+        self._rebalance()
+
+    def _rebalance(self) -> None:
+        """
+        Redistribui a banda entre os downloads ativos. No backend em processo
+        o novo limite vale na hora; no subprocess ele é fixado ao iniciar.
+        """
+        self._last_budget = self.bandwidth.current_budget()
+        if self._ytdlp_engine is None:
+            return
+        for download_id, limit in self.bandwidth.allocations().items():
+            self._ytdlp_engine.set_rate_limit(download_id, limit)
+
+    def _check_budget_schedule(self) -> None:
+        # Chamado no caminho do progresso; olha o relógio no máximo a cada 30 s
+        now = time.monotonic()
+        if now - self._budget_checked_at < 30:
+            return
+        self._budget_checked_at = now
+        if self.bandwidth.current_budget() != self._last_budget:
+            self._rebalance()
+
+    def pause(self, download_id: str) -> bool:
+        """Pausa um item ainda na fila; ele mantém sua posição."""
+        with self.lock:
+            entry = self.items.get(download_id)
+            if not entry or entry["status"] != "queued":
+                return False
+            entry["status"] = "paused"
         self._emit_status(entry)
-        t = threading.Thread(
-            target=self._download_worker, args=(download_id,), daemon=True
-        )
-        entry["thread"] = t
-        t.start()
+        return True
+
+    def resume(self, download_id: str) -> bool:
+        with self.lock:
+            entry = self.items.get(download_id)
+            if not entry or entry["status"] != "paused":
+                return False
+            entry["status"] = "queued"
+        self._emit_status(entry)
+        self._schedule()
+        return True
+
+    def set_priority(self, download_id: str, priority: int) -> bool:
+        with self.lock:
+            entry = self.items.get(download_id)
+            if not entry or download_id not in self._queue:
+                return False
+            entry["priority"] = priority
+            self._queue.remove(download_id)
+            self._enqueue_locked(download_id)
+        self._journal_put(entry)
+        self._journal_order()
+        self._schedule()
+        return True
+
+    def reorder(self, download_id: str, index: int) -> bool:
+        """Move um item da fila para a posição indicada."""
+        with self.lock:
+            if download_id not in self._queue:
+                return False
+            self._queue.remove(download_id)
+            index = max(0, min(int(index), len(self._queue)))
+            self._queue.insert(index, download_id)
+        self._journal_order()
+        self._schedule()
+        return True
+
+    def get_queue(self) -> List[str]:
+        with self.lock:
+            return list(self._queue)
+
+    def active_count(self) -> int:
+        """Quantos downloads estão ocupando vagas agora."""
+        with self.lock:
+            return len(self._active)
+
+    # ==============================================================
+    # PERSISTÊNCIA
+    # ==============================================================
+
+    def _restore(self) -> None:
+        """
+        Recarrega a fila do diário. Itens que estavam baixando voltam para a
+        fila com o mesmo output_template, então o yt-dlp continua do arquivo
+        .part em vez de recomeçar do zero. Eles retomam antes dos demais,
+        que seguem a última ordem gravada.
+        """
+        if self.journal is None:
+            return
+        entries, order = self.journal.load()
+        with self.lock:
+            interrupted = []
+            for download_id, entry in entries.items():
+                if entry.get("status") in ("downloading", "processing"):
+                    entry["status"] = "queued"
+                    interrupted.append(download_id)
+                entry["process"] = None
+                entry["thread"] = None
+                entry.setdefault("priority", 0)
+                entry.setdefault("host", self._host_of(entry.get("url", "")))
+                if "dedup_key" not in entry:
+                    # Itens de versões antigas mantêm o nome de arquivo que já tinham
+                    self._assign_key(entry)
+                self.items[download_id] = entry
+            self._seq = itertools.count(
+                max((e.get("seq") or 0 for e in entries.values()), default=0) + 1
+            )
+            # Fila da última reordenação gravada; os itens enfileirados depois
+            # dela entram por prioridade, na ordem de chegada (seq)
+            self._queue = [
+                i
+                for i in order
+                if i not in interrupted and entries[i]["status"] in ("queued", "paused")
+            ]
+            later = sorted(
+                (
+                    i
+                    for i, e in entries.items()
+                    if e["status"] in ("queued", "paused")
+                    and i not in interrupted
+                    and i not in self._queue
+                ),
+                key=lambda i: entries[i].get("seq") or 0,
+            )
+            for download_id in later:
+                self._enqueue_locked(download_id)
+            # Os interrompidos retomam primeiro, à frente de qualquer prioridade
+            self._queue = interrupted + self._queue
+            self.journal.compact(self.items, self._queue)
+        self._schedule()
+
+    def _journal_put(self, entry: Dict[str, Any]) -> None:
+        if self.journal is not None:
+            self.journal.put(entry)
+
+    def _journal_order(self) -> None:
+        # Só em reordenações/prioridade: novos itens levam a posição no "seq"
+        if self.journal is not None:
+            with self.lock:
+                queue = list(self._queue)
+                seq = max((e.get("seq") or 0 for e in self.items.values()), default=0)
+            self.journal.set_order(queue, seq)
 
     # ==============================================================
     # WORKER
     # ==============================================================
 
+    def _apply_format(
+        self, entry: Dict[str, Any], metadata: Optional[Dict[str, Any]]
+    ) -> None:
+        """Escolhe o formato pelas restrições e ajusta o perfil ao protocolo real."""
+        constraints = dict(self.format_constraints)
+        constraints.update(entry.get("format_constraints") or {})
+        formats = (metadata or {}).get("formats")
+        if formats:
+            chosen = select_format(formats, constraints, entry["only_audio"])
+        else:
+            chosen = {"format": fallback_spec(constraints, entry["only_audio"])}
+        entry["format"] = chosen
+        if metadata and metadata.get("duration_seconds") and not entry.get("duration"):
+            entry["duration"] = metadata["duration_seconds"]
+        if chosen.get("protocol"):
+            stream_type = detect_stream_type(entry["url"], chosen)
+            if stream_type != (entry.get("profile") or {}).get("stream_type"):
+                entry["profile"] = build_profile(
+                    stream_type, entry.get("profile_overrides")
+                )
+
+    def _ensure_format(self, entry: Dict[str, Any]) -> None:
+        if entry.get("format"):
+            return
+        metadata = None
+        if callable(self.metadata_provider):
+            try:
+                metadata = self.metadata_provider(entry["url"])
+            except Exception as exc:
+                print(f"[DownloadManager] Metadados indisponíveis: {exc}")
+        if metadata and not metadata.get("error") and not entry["title"]:
+            # Itens importados em lote chegam só com o link
+            with self.lock:
+                entry["title"] = metadata.get("title") or ""
+                entry["uploader"] = entry["uploader"] or metadata.get("uploader") or ""
+                entry["thumbnail"] = entry["thumbnail"] or metadata.get("thumbnail") or ""
+                entry["output_template"] = self._output_template(entry)
+            self._emit_status(entry)
+        self._apply_format(entry, metadata)
+
+    def _build_options(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Opções do download no formato da API do yt-dlp."""
+        opts: Dict[str, Any] = {"updatetime": False, "outtmpl": entry["output_template"]}
+        chosen = entry.get("format") or {}
+        opts["format"] = chosen.get("format") or fallback_spec(
+            self.format_constraints, entry["only_audio"]
+        )
+        if entry["only_audio"]:
+            # "best" extrai o áudio copiando o codec original (m4a/opus)
+            codec = "best"
+            if self._wants_transcode(entry) and not callable(self.transcoder):
+                codec = entry["audio_format"]
+            opts["postprocessors"] = [
+                {"key": "FFmpegExtractAudio", "preferredcodec": codec}
+            ]
+        else:
+            if chosen.get("merge_output_format"):
+                opts["merge_output_format"] = chosen["merge_output_format"]
+            if chosen.get("remux_video"):
+                opts["postprocessors"] = [
+                    {"key": "FFmpegVideoRemuxer", "preferedformat": chosen["remux_video"]}
+                ]
+        opts.update(profile_to_options(entry.get("profile") or {}))
+        ratelimit = self.bandwidth.share(entry["id"])
+        if ratelimit:
+            opts["ratelimit"] = ratelimit
+        return opts
+
+    @staticmethod
+    def _wants_transcode(entry: Dict[str, Any]) -> bool:
+        return entry["only_audio"] and entry.get("audio_format") not in (
+            None,
+            "native",
+            "best",
+        )
+
+    def _transcode(self, entry: Dict[str, Any], path: str) -> str:
+        """Converte o áudio nativo já baixado, sem ocupar uma vaga de download."""
+        audio_format = entry["audio_format"]
+        if path.endswith(f".{audio_format}"):
+            return path
+        self._release_slot(entry["id"])
+        with self.lock:
+            entry["status"] = "processing"
+        self._emit_status(entry)
+        self._set_progress(entry, 100.0, phase=f"postprocess:{audio_format}")
+        converted = self.transcoder(path, audio_format)
+        if not converted:
+            raise RuntimeError(f"Falha ao converter para {audio_format}")
+        if converted != path:
+            os.remove(path)
+        return converted
+
+    def _set_progress(self, entry: Dict[str, Any], pct: float, **fields) -> None:
+        # Atribuição simples: não precisa do lock, o barramento agrupa o resto
+        pct = max(0.0, min(100.0, pct))
+        entry["progress"] = pct
+        self.progress_bus.publish(
+            ProgressRecord(entry["id"], entry["status"], pct, **fields)
+        )
+
+    def _on_download_progress(self, entry: Dict[str, Any], d: Dict[str, Any]) -> None:
+        """Trata um dict de progress_hook (ou linha do template já convertida)."""
+        if d.get("status") != "downloading":
+            return
+        self._check_budget_schedule()
+        stats = self.telemetry.update(entry["id"], entry["host"], d)
+        total = stats["total_bytes"]
+        done = stats["downloaded_bytes"]
+        if total and done is not None:
+            pct = done * 100.0 / total
+        elif stats["fragment_index"] and stats["fragment_count"]:
+            pct = stats["fragment_index"] * 100.0 / stats["fragment_count"]
+        else:
+            pct = entry["progress"]
+        self._set_progress(
+            entry,
+            pct,
+            downloaded_bytes=done,
+            total_bytes=total,
+            speed=stats["speed"],
+            speed_avg=stats["speed_avg"],
+            eta=stats["eta"],
+            fragment_index=stats["fragment_index"],
+            fragment_count=stats["fragment_count"],
+        )
+
+    def _on_postprocess(self, entry: Dict[str, Any], d: Dict[str, Any]) -> None:
+        if d.get("status") != "started":
+            return
+        # Mantém os últimos números do download junto com a nova fase
+        stats = self.telemetry.get(entry["id"])
+        self._set_progress(
+            entry,
+            entry["progress"],
+            phase=f"postprocess:{d.get('postprocessor', '')}",
+            downloaded_bytes=stats.get("downloaded_bytes"),
+            total_bytes=stats.get("total_bytes"),
+        )
+
+    def _run_subprocess(self, entry: Dict[str, Any], opts: Dict[str, Any]) -> None:
+        cmd = (
+            [self.yt_dlp_bin]
+            + options_to_args(opts)
+            + PROGRESS_TEMPLATE_ARGS
+            + [entry["url"]]
+        )
+        p = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        with self.lock:
+            entry["process"] = p
+
+        for line in p.stdout:
+            if not line:
+                continue
+            d = parse_progress_line(line)
+            if d is not None:
+                if "postprocessor" in d:
+                    self._on_postprocess(entry, d)
+                else:
+                    self._on_download_progress(entry, d)
+                continue
+            # Saída de versões antigas do yt-dlp: só a porcentagem
+            m = self._pct_re.search(line)
+            if m:
+                try:
+                    self._set_progress(entry, float(m.group("pct")))
+                except Exception:
+                    pass
+
+        ret = p.wait()
+        with self.lock:
+            entry["process"] = None
+        if ret != 0:
+            raise RuntimeError(f"yt-dlp exit {ret}")
+
+    def _run_inprocess(self, entry: Dict[str, Any], opts: Dict[str, Any]) -> None:
+        self._ytdlp_engine.download(
+            entry["url"],
+            opts,
+            on_progress=lambda d: self._on_download_progress(entry, d),
+            on_postprocess=lambda d: self._on_postprocess(entry, d),
+            job_id=entry["id"],
+        )
+
+    def get_throughput(self) -> Dict[str, Any]:
+        """Vazão agregada dos downloads ativos (total e por host)."""
+        return self.telemetry.throughput()
+
     def _download_worker(self, download_id: str) -> None:
         with self.lock:
             entry = self.items.get(download_id)
             if not entry:
                 return
-            url = entry["url"]
-            only_audio = entry["only_audio"]
-            out_template = entry["output_template"]
-
-        cmd = [self.yt_dlp_bin]
-        if only_audio:
-            cmd += ["-f", "bestaudio", "-x", "--audio-format", "mp3", "--no-mtime"]
-        else:
-            cmd += ["-f", "best", "--no-mtime"]
-        cmd += ["-o", out_template, url]
 
         try:
-            p = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
-            with self.lock:
-                entry["process"] = p
+            self._ensure_format(entry)
+            # Lido depois dos metadados: itens sem título ganham nome agora
+            out_template = entry["output_template"]
+            opts = self._build_options(entry)
+            if self._ytdlp_engine is not None:
+                try:
+                    self._run_inprocess(entry, opts)
+                except ImportError:
+                    # yt_dlp indisponível em tempo de execução: volta ao binário
+                    self._ytdlp_engine = None
+                    self.engine = "subprocess"
+                    self._run_subprocess(entry, opts)
+            else:
+                self._run_subprocess(entry, opts)
 
-            for line in p.stdout:
-                if not line:
-                    continue
-                m = self._pct_re.search(line)
-                if m:
-                    try:
-                        pct = float(m.group("pct"))
-                        with self.lock:
-                            entry["progress"] = max(0.0, min(100.0, pct))
-                        self._emit_progress(entry)
-                    except Exception:
-                        pass
-
-            ret = p.wait()
-            with self.lock:
-                entry["process"] = None
+            final_path = self._find_output(out_template)
+            if final_path and self._wants_transcode(entry) and callable(self.transcoder):
+                final_path = self._transcode(entry, final_path)
+            if final_path:
+                # Se Android e não puder gravar direto, move o arquivo
+                if self._is_android() and not os.access(self.download_dir, os.W_OK):
+                    dest = os.path.join(self.download_dir, os.path.basename(final_path))
+                    shutil.move(final_path, dest)
+                    final_path = dest
 
-            if ret == 0:
-                final_path = self._find_output(out_template)
-                if final_path:
-                    # Se Android e não puder gravar direto, move o arquivo
-                    if self._is_android() and not os.access(self.download_dir, os.W_OK):
-                        dest = os.path.join(
-                            self.download_dir, os.path.basename(final_path)
-                        )
-                        shutil.move(final_path, dest)
-                        final_path = dest
-
-                    entry["final_path"] = final_path
-                    entry["status"] = "completed"
-                    entry["progress"] = 100.0
-                    self._emit_complete(entry)
-                else:
-                    entry["status"] = "error"
-                    entry["error"] = "Arquivo final não encontrado"
-                    self._emit_error(entry)
+                entry["final_path"] = final_path
+                with self._outputs_lock:
+                    if self._outputs is not None:
+                        self._note_output_locked(final_path)
+                entry["status"] = "completed"
+                entry["progress"] = 100.0
+                self._emit_complete(entry)
             else:
                 entry["status"] = "error"
-                entry["error"] = f"yt-dlp exit {ret}"
+                entry["error"] = "Arquivo final não encontrado"
                 self._emit_error(entry)
 
         except Exception as exc:
@@ -242,6 +996,9 @@ class DownloadManager:
                 entry["status"] = "error"
                 entry["error"] = str(exc)
             self._emit_error(entry)
+        finally:
+            self.telemetry.finish(download_id)
+            self._release_slot(download_id)
 
     # ==============================================================
     # AUXILIARES
@@ -249,7 +1006,7 @@ class DownloadManager:
 
     def _find_output(self, out_template: str) -> Optional[str]:
         base = out_template.replace("%(ext)s", "")
-        for ext_try in ("mp4", "mkv", "webm", "mp3", "m4a"):
+        for ext_try in ("mp4", "mkv", "webm", "mp3", "m4a", "opus", "ogg"):
             candidate = f"{base}{ext_try}"
             if os.path.exists(candidate):
                 return candidate
@@ -259,14 +1016,40 @@ class DownloadManager:
     # CALLBACKS
     # ==============================================================
 
-    def _emit_progress(self, entry: Dict[str, Any]):
-        if callable(self.on_progress):
+    def _dispatch_progress(self, records: List[ProgressRecord]):
+        """Chamado pelo barramento com o lote de progresso de um intervalo."""
+        if callable(self.on_progress_batch):
             try:
-                self.on_progress(dict(entry))
+                self.on_progress_batch(records)
             except Exception:
                 pass
+        if callable(self.on_progress):
+            for record in records:
+                try:
+                    self.on_progress(record._asdict())
+                except Exception:
+                    pass
+
+    def _publish_final(self, entry: Dict[str, Any]) -> None:
+        """
+        Publica o registro final (completed/error) e esvazia o barramento,
+        para que nenhum "downloading" atrasado chegue depois do on_complete.
+        """
+        stats = self.telemetry.get(entry["id"])
+        self.progress_bus.publish(
+            ProgressRecord(
+                entry["id"],
+                entry["status"],
+                entry["progress"],
+                downloaded_bytes=stats.get("downloaded_bytes"),
+                total_bytes=stats.get("total_bytes"),
+            )
+        )
+        self.progress_bus.flush()
 
     def _emit_complete(self, entry: Dict[str, Any]):
+        self._journal_put(entry)
+        self._publish_final(entry)
         if callable(self.on_complete):
             try:
                 self.on_complete(dict(entry))
@@ -274,6 +1057,8 @@ class DownloadManager:
                 pass
 
     def _emit_error(self, entry: Dict[str, Any]):
+        self._journal_put(entry)
+        self._publish_final(entry)
         if callable(self.on_error):
             try:
                 self.on_error(dict(entry))
@@ -281,6 +1066,7 @@ class DownloadManager:
                 pass
 
     def _emit_status(self, entry: Dict[str, Any]):
+        self._journal_put(entry)
         if callable(self.on_status):
             try:
                 self.on_status(dict(entry))
@@ -1,47 +1,212 @@
-import os
+import threading
 import flet as ft
 
+PAGE_SIZE = 50
+
+SORT_OPTIONS = {
+    "recent": "Mais recentes",
+    "name": "Nome",
+    "size": "Tamanho",
+    "duration": "Duração",
+}
+
+
+def _format_duration(seconds) -> str:
+    if not seconds:
+        return ""
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+
 def downloads_page(self, w: int):
-    downloads_dir = os.path.join(os.path.expanduser("~"), "Downloads", "SnapDL")
-    if os.path.exists("/storage/emulated/0/Download/SnapDL"):  # Android
-        downloads_dir = "/storage/emulated/0/Download/SnapDL"
+    view = self.library_view
 
-    os.makedirs(downloads_dir, exist_ok=True)
-    files = os.listdir(downloads_dir)
+    rows_view = ft.ListView(expand=True, spacing=8)
+    page_label = ft.Text("", color=self.colors["hint"], size=12)
+    thumbs = {}  # caminho -> ft.Image das linhas que ainda esperam miniatura
+    rows = {}  # caminho -> linha exibida na página atual
+    # refresh() roda na thread da UI e on_library_update na do watcher
+    rows_lock = threading.RLock()
 
-    items = []
-    if not files:
-        items.append(
-            ft.Text("Nenhum arquivo encontrado.", color=self.colors["hint"], size=14)
+    def build_row(item):
+        thumb = ft.Image(
+            src=item["thumbnail"],
+            width=64,
+            height=36,
+            fit=ft.ImageFit.COVER,
+            border_radius=4,
+            visible=bool(item["thumbnail"]),
         )
-    else:
-        for f in files:
-            full_path = os.path.join(downloads_dir, f)
-            size_mb = os.path.getsize(full_path) / (1024 * 1024)
-            items.append(
-                ft.Container(
-                    padding=ft.padding.symmetric(vertical=8, horizontal=10),
-                    content=ft.Row(
-                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+        if not item["thumbnail"]:
+            thumbs[item["path"]] = thumb
+        details = f"{item['size'] / (1024 * 1024):.1f} MB"
+        duration = _format_duration(item["duration"])
+        if duration:
+            details = f"{duration} · {details}"
+        return ft.Container(
+            padding=ft.padding.symmetric(vertical=8, horizontal=10),
+            content=ft.Row(
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                controls=[
+                    thumb,
+                    ft.Column(
+                        spacing=2,
+                        expand=True,
                         controls=[
                             ft.Text(
-                                f,
+                                item["title"] or item["name"],
                                 color=self.colors["text"],
                                 size=14,
                                 max_lines=1,
                                 overflow=ft.TextOverflow.ELLIPSIS,
                             ),
                             ft.Text(
-                                f"{size_mb:.1f} MB",
+                                item["uploader"] or "",
                                 color=self.colors["hint"],
-                                size=12,
+                                size=11,
+                                max_lines=1,
+                                visible=bool(item["uploader"]),
                             ),
                         ],
                     ),
-                    border=ft.border.all(1, self.colors["border"]),
-                    border_radius=6,
-                )
+                    ft.Text(details, color=self.colors["hint"], size=12),
+                ],
+            ),
+            border=ft.border.all(1, self.colors["border"]),
+            border_radius=6,
+        )
+
+    def on_thumbnail(full_path, src):
+        image = thumbs.get(full_path)
+        if not src:
+            return
+        self.library.set_thumbnail(full_path, src)
+        if not image:
+            return
+        image.src = src
+        image.visible = True
+        try:
+            image.update()
+        except Exception:
+            pass  # a página já foi trocada
+
+    def refresh(update=True):
+        library = self.library
+        with rows_lock:
+            total = library.count(view["search"])
+            pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+            view["page"] = max(0, min(view["page"], pages - 1))
+            items = library.query(
+                view["search"],
+                view["sort"],
+                descending=view["sort"] != "name",
+                limit=PAGE_SIZE,
+                offset=view["page"] * PAGE_SIZE,
+            )
+            thumbs.clear()
+            rows.clear()
+            for item in items:
+                rows[item["path"]] = build_row(item)
+            rows_view.controls = list(rows.values()) or [
+                ft.Text("Nenhum arquivo encontrado.", color=self.colors["hint"], size=14)
+            ]
+            page_label.value = f"{view['page'] + 1} / {pages} · {total} arquivos"
+            prev_button.disabled = view["page"] == 0
+            next_button.disabled = view["page"] >= pages - 1
+            missing = list(thumbs)
+
+        # Miniaturas que faltam são geradas num único lote, fora da thread da UI
+        if missing:
+            self.ffmpeg_setup.generate_thumbnails_async(
+                missing, on_thumbnail, width=128
             )
+        if update:
+            try:
+                self.page.update()
+            except Exception:
+                pass
+
+    def on_search(e):
+        view["search"] = e.control.value or ""
+        view["page"] = 0
+        refresh()
+
+    def on_sort(e):
+        view["sort"] = e.control.value
+        view["page"] = 0
+        refresh()
+
+    def change_page(delta):
+        view["page"] += delta
+        refresh()
+
+    prev_button = ft.IconButton(
+        icon=ft.Icons.CHEVRON_LEFT,
+        icon_color=self.colors["icon"],
+        on_click=lambda e: change_page(-1),
+    )
+    next_button = ft.IconButton(
+        icon=ft.Icons.CHEVRON_RIGHT,
+        icon_color=self.colors["icon"],
+        on_click=lambda e: change_page(1),
+    )
+    search_field = ft.TextField(
+        value=view["search"],
+        hint_text="Buscar na biblioteca",
+        hint_style=ft.TextStyle(color=self.colors["hint"]),
+        color=self.colors["text"],
+        bgcolor=self.colors["search_bg"],
+        border_color=self.colors["search_border"],
+        dense=True,
+        expand=True,
+        on_submit=on_search,
+    )
+    sort_dropdown = ft.Dropdown(
+        value=view["sort"],
+        width=160,
+        dense=True,
+        color=self.colors["text"],
+        border_color=self.colors["border"],
+        options=[ft.dropdown.Option(key, label) for key, label in SORT_OPTIONS.items()],
+        on_change=on_sort,
+    )
+
+    def on_library_update(delta):
+        """Aplica só o que mudou (vindo do watcher) nas linhas visíveis."""
+        if self.current_route != "/downloads":
+            return
+        missing = []
+        with rows_lock:
+            if any(p not in rows for p in delta["updated"]):
+                # Arquivo novo: a posição depende da ordenação, relê só esta página
+                refresh()
+                return
+            for path in delta["removed"]:
+                row = rows.pop(path, None)
+                if row in rows_view.controls:
+                    rows_view.controls.remove(row)
+            for path in delta["updated"]:
+                item = self.library.get(path)
+                if item and path in rows:
+                    index = rows_view.controls.index(rows[path])
+                    rows[path] = rows_view.controls[index] = build_row(item)
+                    if not item["thumbnail"]:
+                        missing.append(path)
+        if missing:
+            self.ffmpeg_setup.generate_thumbnails_async(
+                missing, on_thumbnail, width=128
+            )
+        try:
+            rows_view.update()
+        except Exception:
+            pass
+
+    # Registra o ouvinte antes de abrir a biblioteca: a primeira varredura do
+    # watcher (em outra thread) pode terminar enquanto a página é montada
+    self.on_library_update = on_library_update
+    refresh(update=False)
 
     return ft.Container(
         width=w,
@@ -49,8 +214,13 @@ def downloads_page(self, w: int):
         content=ft.Column(
             controls=[
                 ft.Text("Downloads", color=self.colors["text"], size=22, weight=ft.FontWeight.BOLD),
+                ft.Row(controls=[search_field, sort_dropdown]),
                 ft.Divider(height=10, color=self.colors["border"]),
-                ft.ListView(expand=True, spacing=8, controls=items),
+                rows_view,
+                ft.Row(
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    controls=[prev_button, page_label, next_button],
+                ),
             ],
             expand=True,
         ),
@@ -1,9 +1,16 @@
 import os
+import json
+import hashlib
 import platform
 import subprocess
-import shutil
 import threading
-from typing import Callable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .binary_registry import BinaryRegistry, default_registry
+from .paths import app_data_dir as data_dir
+from .postprocess import PostProcessPipeline
+
+# Arquivos de onde faz sentido extrair um quadro
+VIDEO_EXTS = (".mp4", ".mkv", ".webm", ".mov", ".avi", ".m4v")
 
 
 class FFmpegHelper:
@@ -14,8 +21,14 @@ class FFmpegHelper:
         binaries_subdir: str = "binaries",
         on_ready: Optional[Callable[[str], None]] = None,
         on_error: Optional[Callable[[str], None]] = None,
+        registry: Optional[BinaryRegistry] = None,
+        max_jobs: Optional[int] = None,
+        load_provider: Optional[Callable[[], int]] = None,
+        on_job_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        thumbs_dir: Optional[str] = None,
     ):
         self.base_dir = base_dir or os.getcwd()
+        self.registry = registry or default_registry()
         self.app_data_dir = app_data_dir or os.getcwd()
         self.binaries_subdir = binaries_subdir
         self.ffmpeg_path: Optional[str] = None
@@ -26,6 +39,24 @@ class FFmpegHelper:
         self.ffmpeg_path = self._detect_ffmpeg_path()
         self.ensure_ffmpeg_ready()
 
+        # Miniaturas da biblioteca: caminho -> {mtime, tamanho, arquivo}
+        self.thumbs_dir = thumbs_dir or data_dir("cache", "library_thumbnails")
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+        self._thumbs_index_path = os.path.join(self.thumbs_dir, "index.json")
+        self._thumbs_lock = threading.Lock()
+        # Evita jobs repetidos quando a página pede o mesmo lote de novo:
+        # (caminho, largura) -> {"job": job da fila, "ready": Event}
+        self._thumbs_in_flight: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._thumbs_index: Dict[str, Dict[str, Any]] = self._load_thumbs_index()
+
+        # Pós-processamento (miniaturas, remux, conversões...) numa fila limitada
+        self.pipeline = PostProcessPipeline(
+            self,
+            max_workers=max_jobs,
+            load_provider=load_provider,
+            on_progress=on_job_progress,
+        )
+
     # ============================================================
     # DETECÇÃO DE AMBIENTE
     # ============================================================
@@ -65,12 +96,9 @@ class FFmpegHelper:
         if self._is_android():
             return os.path.join(self.app_data_dir, "ffmpeg")
 
-        # Se o ffmpeg estiver disponível no PATH, usa ele
-        try:
-            subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
+        # Se o ffmpeg estiver disponível no PATH, usa ele (sondagem cacheada)
+        if self.registry.probe("ffmpeg", "ffmpeg", ["-version"]):
             return "ffmpeg"
-        except Exception:
-            pass
 
         # Caso contrário, tenta usar o binário embutido
         if os.path.exists(embedded_ffmpeg):
@@ -96,24 +124,16 @@ class FFmpegHelper:
         local_ffmpeg = os.path.join(self.base_dir, self.binaries_subdir, "ffmpeg")
 
         try:
-            # Android: copia pra pasta segura se necessário
+            # Android: copia pra pasta segura se faltar ou estiver desatualizado
             if self._is_android():
-                if not os.path.exists(self.ffmpeg_path) and os.path.exists(
-                    local_ffmpeg
-                ):
-                    shutil.copy(local_ffmpeg, self.ffmpeg_path)
-                    os.chmod(self.ffmpeg_path, 0o755)
-                else:
-                    os.chmod(self.ffmpeg_path, 0o755)
-            else:
+                self.registry.install_copy(local_ffmpeg, self.ffmpeg_path)
+            elif self.ffmpeg_path != "ffmpeg":
                 # macOS/Linux/Windows: garante permissão se embutido
-                if self.ffmpeg_path != "ffmpeg" and os.path.exists(self.ffmpeg_path):
-                    os.chmod(self.ffmpeg_path, 0o755)
+                self.registry.ensure_executable(self.ffmpeg_path)
 
-            # Testa execução
-            subprocess.run(
-                [self.ffmpeg_path, "-version"], capture_output=True, check=True
-            )
+            # Testa execução (só roda de novo se o binário mudou)
+            if not self.registry.probe("ffmpeg", self.ffmpeg_path, ["-version"]):
+                raise RuntimeError(f"{self.ffmpeg_path} -version falhou")
             if self.on_ready:
                 self.on_ready(self.ffmpeg_path)
 
@@ -131,8 +151,18 @@ class FFmpegHelper:
         full_cmd = [self.ffmpeg_path] + cmd
         return subprocess.run(full_cmd, capture_output=True, text=True)
 
+    def transcode_audio(
+        self, src: str, audio_format: str = "mp3", bitrate: str = "192k"
+    ) -> Optional[str]:
+        """Converte o áudio de `src` para `audio_format` pela fila de pós-processamento."""
+        dest = f"{os.path.splitext(src)[0]}.{audio_format}"
+        if dest == src:
+            return src
+        job = self.pipeline.run("transcode", src, dest, bitrate=bitrate)
+        return dest if job["status"] == "completed" else None
+
     def generate_thumbnail(
-        self, video_path: str, output_dir: Optional[str] = None
+        self, video_path: str, output_dir: Optional[str] = None, width: int = 320
     ) -> Optional[str]:
         try:
             if not os.path.exists(video_path):
@@ -141,14 +171,17 @@ class FFmpegHelper:
             thumb_path = os.path.join(
                 output_dir, f"thumb_{os.path.basename(video_path)}.jpg"
             )
+            # -ss antes do -i busca pelo índice em vez de decodificar desde o início
             cmd = [
                 "-y",
-                "-i",
-                video_path,
                 "-ss",
                 "00:00:01",
-                "-vframes",
+                "-i",
+                video_path,
+                "-frames:v",
                 "1",
+                "-vf",
+                f"scale={width}:-2",
                 thumb_path,
             ]
             self.run(cmd)
@@ -159,11 +192,183 @@ class FFmpegHelper:
     def generate_thumbnail_async(
         self, video_path: str, callback: Callable[[Optional[str]], None]
     ) -> None:
-        def worker():
-            thumb = self.generate_thumbnail(video_path)
+        if not os.path.exists(video_path):
             try:
-                callback(thumb)
+                callback(None)
             except Exception:
                 pass
+            return
+        thumb_path = os.path.join(
+            self.app_data_dir, f"thumb_{os.path.basename(video_path)}.jpg"
+        )
+        self.pipeline.submit(
+            "thumbnail",
+            video_path,
+            thumb_path,
+            callback=lambda job: callback(
+                job["dest"] if job["status"] == "completed" else None
+            ),
+        )
+
+    # ============================================================
+    # MINIATURAS EM LOTE (BIBLIOTECA)
+    # ============================================================
+    def _load_thumbs_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._thumbs_index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_thumbs_index(self) -> None:
+        tmp = f"{self._thumbs_index_path}.tmp"
+        try:
+            with self._thumbs_lock:
+                data = json.dumps(self._thumbs_index)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self._thumbs_index_path)
+        except OSError:
+            pass
+
+    def cached_thumbnail(self, path: str, width: int = 320) -> Optional[str]:
+        """Miniatura já gerada para o arquivo, se ele não mudou desde então."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._thumbs_lock:
+            entry = self._thumbs_index.get(path)
+        if (
+            entry
+            and entry["mtime"] == st.st_mtime_ns
+            and entry["size"] == st.st_size
+            and entry["width"] == width
+        ):
+            thumb = os.path.join(self.thumbs_dir, entry["file"])
+            if os.path.exists(thumb):
+                return thumb
+        return None
+
+    def generate_thumbnails(
+        self,
+        paths: Iterable[str],
+        width: int = 320,
+        on_thumbnail: Optional[Callable[[str, Optional[str]], None]] = None,
+    ) -> Dict[str, Optional[str]]:
+        """
+        Gera miniaturas de vários arquivos de uma vez. Arquivos inalterados
+        (mesmo caminho, mtime e tamanho) saem do cache sem abrir o ffmpeg;
+        o resto vira jobs na fila de pós-processamento, que limita o paralelismo.
+        Arquivos que outro lote já está processando não geram jobs novos: o
+        lote espera pelo job existente. `on_thumbnail(caminho, miniatura)` é
+        chamado à medida que ficam prontas.
+        """
+
+        def notify(path: str, thumb: Optional[str]) -> None:
+            results[path] = thumb
+            if callable(on_thumbnail):
+                try:
+                    on_thumbnail(path, thumb)
+                except Exception:
+                    pass
+
+        results: Dict[str, Optional[str]] = {}
+        pending: Dict[str, Any] = {}
+        shared: Dict[str, Dict[str, Any]] = {}
+        for path in paths:
+            if not path.lower().endswith(VIDEO_EXTS):
+                notify(path, None)
+                continue
+            # Consulta os jobs em andamento antes do cache: quem termina
+            # grava o índice antes de sair desta lista
+            with self._thumbs_lock:
+                in_flight = self._thumbs_in_flight.get((path, width))
+            if in_flight is not None:
+                shared[path] = in_flight
+                continue
+            cached = self.cached_thumbnail(path, width)
+            if cached:
+                notify(path, cached)
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                notify(path, None)
+                continue
+            claim = {"job": None, "ready": threading.Event()}
+            with self._thumbs_lock:
+                in_flight = self._thumbs_in_flight.setdefault((path, width), claim)
+            if in_flight is not claim:
+                shared[path] = in_flight
+                continue
+            key = f"{path}|{st.st_mtime_ns}|{st.st_size}|{width}"
+            name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jpg"
+            try:
+                # Guarda o próprio job: em lotes grandes o id sai do histórico da fila
+                claim["job"] = self.pipeline.submit_job(
+                    "thumbnail", path, os.path.join(self.thumbs_dir, name), width=width
+                )
+            except Exception:
+                with self._thumbs_lock:
+                    self._thumbs_in_flight.pop((path, width), None)
+                notify(path, None)
+                continue
+            finally:
+                claim["ready"].set()
+            pending[path] = (claim["job"], name, st)
+
+        changed = False
+        for path, (job, name, st) in pending.items():
+            job["done"].wait()
+            if job["status"] != "completed":
+                with self._thumbs_lock:
+                    self._thumbs_in_flight.pop((path, width), None)
+                notify(path, None)
+                continue
+            with self._thumbs_lock:
+                old = self._thumbs_index.get(path)
+                self._thumbs_index[path] = {
+                    "mtime": st.st_mtime_ns,
+                    "size": st.st_size,
+                    "width": width,
+                    "file": name,
+                }
+                self._thumbs_in_flight.pop((path, width), None)
+            if old and old.get("file") != name:
+                # O arquivo mudou: a miniatura antiga não serve mais
+                try:
+                    os.remove(os.path.join(self.thumbs_dir, old["file"]))
+                except OSError:
+                    pass
+            changed = True
+            notify(path, job["dest"])
+
+        for path, claim in shared.items():
+            claim["ready"].wait()
+            job = claim["job"]
+            if job is not None:
+                job["done"].wait()
+            ok = job is not None and job["status"] == "completed"
+            notify(path, job["dest"] if ok else None)
+
+        if changed:
+            self._save_thumbs_index()
+        return results
+
+    def generate_thumbnails_async(
+        self,
+        paths: Iterable[str],
+        on_thumbnail: Callable[[str, Optional[str]], None],
+        width: int = 320,
+    ) -> None:
+        """Roda `generate_thumbnails` numa única thread para o lote inteiro."""
+        paths = list(paths)
+        threading.Thread(
+            target=self.generate_thumbnails,
+            args=(paths, width, on_thumbnail),
+            daemon=True,
+        ).start()
 
-        threading.Thread(target=worker, daemon=True).start()
+    def close(self) -> None:
+        self.pipeline.close()
@@ -0,0 +1,191 @@
+from typing import Any, Dict, List, Optional
+
+# Campos dos formatos do yt-dlp que interessam para a escolha
+FORMAT_FIELDS = (
+    "format_id",
+    "ext",
+    "vcodec",
+    "acodec",
+    "width",
+    "height",
+    "fps",
+    "tbr",
+    "abr",
+    "filesize",
+    "filesize_approx",
+    "protocol",
+)
+
+DEFAULT_CONSTRAINTS: Dict[str, Any] = {
+    "max_height": 1080,
+    "video_codecs": ["avc1", "vp9", "av01"],  # ordem de preferência
+    "audio_codecs": ["mp4a", "opus", "vorbis"],
+    "container": "mp4",  # None aceita o que evitar recodificação
+    "max_filesize": None,  # bytes
+}
+
+# Codecs que cada container aceita sem recodificar
+CONTAINER_CODECS = {
+    "mp4": {"video": ("avc1", "av01", "hev1", "hvc1"), "audio": ("mp4a", "mp3")},
+    "webm": {"video": ("vp9", "vp09", "vp8", "av01"), "audio": ("opus", "vorbis")},
+}
+
+
+def compact_formats(formats: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Reduz a lista de formatos do yt-dlp aos campos usados na seleção."""
+    return [
+        {k: f.get(k) for k in FORMAT_FIELDS if f.get(k) is not None}
+        for f in formats or []
+        if f.get("format_id")
+    ]
+
+
+def _codec(value: Optional[str]) -> str:
+    value = (value or "none").lower()
+    return "none" if value == "none" else value.split(".")[0]
+
+
+def _rank(codec: str, preference: List[str]) -> int:
+    return preference.index(codec) if codec in preference else len(preference)
+
+
+def _size(f: Dict[str, Any]) -> float:
+    return f.get("filesize") or f.get("filesize_approx") or 0
+
+
+def _fits(container: Optional[str], vcodec: str, acodec: str) -> bool:
+    if not container or container not in CONTAINER_CODECS:
+        return True
+    allowed = CONTAINER_CODECS[container]
+    return (vcodec == "none" or vcodec in allowed["video"]) and (
+        acodec == "none" or acodec in allowed["audio"]
+    )
+
+
+def fallback_spec(constraints: Dict[str, Any], only_audio: bool = False) -> str:
+    """Expressão de formato do yt-dlp para quando não há metadados."""
+    if only_audio:
+        return "bestaudio/best"
+    h = constraints.get("max_height")
+    limit = f"[height<=?{h}]" if h else ""
+    return f"bv*{limit}+ba/b{limit}/b"
+
+
+def select_format(
+    formats: List[Dict[str, Any]],
+    constraints: Optional[Dict[str, Any]] = None,
+    only_audio: bool = False,
+) -> Dict[str, Any]:
+    """
+    Escolhe o formato pelas restrições (resolução máxima, codecs preferidos,
+    container e tamanho). Prefere combinações que só precisam de cópia de
+    stream/remux; nunca pede recodificação.
+    """
+    c = dict(DEFAULT_CONSTRAINTS)
+    c.update(constraints or {})
+    container = c.get("container")
+    max_height = c.get("max_height")
+    budget = c.get("max_filesize")
+
+    videos, audios, muxed = [], [], []
+    for f in formats:
+        vcodec, acodec = _codec(f.get("vcodec")), _codec(f.get("acodec"))
+        if vcodec != "none" and acodec == "none":
+            videos.append(f)
+        elif vcodec == "none" and acodec != "none":
+            audios.append(f)
+        elif vcodec != "none":
+            muxed.append(f)
+
+    audios.sort(
+        key=lambda f: (
+            _fits(container, "none", _codec(f.get("acodec"))),
+            -_rank(_codec(f.get("acodec")), c["audio_codecs"]),
+            f.get("abr") or f.get("tbr") or 0,
+        ),
+        reverse=True,
+    )
+
+    if only_audio:
+        if not audios:
+            return {"format": fallback_spec(c, True), "format_id": None}
+        best = audios[0]
+        return {
+            "format": best["format_id"],
+            "format_id": best["format_id"],
+            "ext": best.get("ext"),
+            "acodec": _codec(best.get("acodec")),
+            "protocol": best.get("protocol"),
+            "filesize": _size(best) or None,
+        }
+
+    def video_key(f):
+        return (
+            f.get("height") or 0,
+            -_rank(_codec(f.get("vcodec")), c["video_codecs"]),
+            f.get("fps") or 0,
+            f.get("tbr") or 0,
+        )
+
+    candidates = [
+        f for f in videos if not max_height or (f.get("height") or 0) <= max_height
+    ]
+    candidates.sort(key=video_key, reverse=True)
+
+    # 1º: pares que cabem no container pedido (só cópia); 2º: qualquer par em MKV
+    for need_fit in (True, False):
+        for video in candidates:
+            vcodec = _codec(video.get("vcodec"))
+            for audio in audios:
+                acodec = _codec(audio.get("acodec"))
+                fits = _fits(container, vcodec, acodec)
+                if need_fit and not fits:
+                    continue
+                size = _size(video) + _size(audio)
+                if budget and size and size > budget:
+                    continue
+                merge = container if fits and container else "mkv"
+                return {
+                    "format": f"{video['format_id']}+{audio['format_id']}",
+                    "format_id": f"{video['format_id']}+{audio['format_id']}",
+                    "ext": merge,
+                    "merge_output_format": merge,
+                    "height": video.get("height"),
+                    "vcodec": vcodec,
+                    "acodec": acodec,
+                    "protocol": video.get("protocol"),
+                    "filesize": size or None,
+                }
+
+    # Sem streams separados: melhor formato progressivo dentro das restrições
+    muxed = [f for f in muxed if not max_height or (f.get("height") or 0) <= max_height]
+    muxed = [f for f in muxed if not budget or not _size(f) or _size(f) <= budget]
+    if muxed:
+        best = max(
+            muxed,
+            key=lambda f: (
+                _fits(container, _codec(f.get("vcodec")), _codec(f.get("acodec"))),
+            )
+            + video_key(f),
+        )
+        result = {
+            "format": best["format_id"],
+            "format_id": best["format_id"],
+            "ext": best.get("ext"),
+            "height": best.get("height"),
+            "vcodec": _codec(best.get("vcodec")),
+            "acodec": _codec(best.get("acodec")),
+            "protocol": best.get("protocol"),
+            "filesize": _size(best) or None,
+        }
+        # Troca só o container quando os codecs permitem (remux, sem recodificar)
+        if (
+            container
+            and best.get("ext") != container
+            and _fits(container, result["vcodec"], result["acodec"])
+        ):
+            result["remux_video"] = container
+            result["ext"] = container
+        return result
+
+    return {"format": fallback_spec(c), "format_id": None}
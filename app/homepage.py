@@ -14,7 +14,9 @@ def homepage(self, w):
     def on_search(e=None):
         value = search_input.value.strip()
         if value:
-            self.search_result = self.seach_mananger.search_youtube(value)
+            # A busca roda em segundo plano; a página de resultados abre já
+            # no estado de carregamento
+            self.run_search(value)
             # self.log(dumps(self.search_result, indent=4))
             self.page.controls.clear()
             self.current_route = "/results"
@@ -0,0 +1,259 @@
+import os
+import re
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional
+from .paths import app_data_dir
+
+# Arquivos temporários do yt-dlp/ffmpeg que não entram na biblioteca
+IGNORED_SUFFIXES = (".part", ".ytdl", ".tmp", ".temp")
+# Formatos separados antes do merge ("titulo.f137.mp4") e saídas intermediárias
+INTERMEDIATE_RE = re.compile(r"\.(f\d+|temp)\.\w+$")
+
+SORT_COLUMNS = {
+    "recent": "mtime",
+    "name": "name COLLATE NOCASE",
+    "size": "size",
+    "duration": "duration",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    duration REAL,
+    url TEXT,
+    title TEXT,
+    uploader TEXT,
+    thumbnail TEXT,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+CREATE INDEX IF NOT EXISTS files_name ON files (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+"""
+
+
+class LibraryIndex:
+    """
+    Índice (SQLite) dos arquivos baixados: nome, tamanho, mtime, duração,
+    origem e miniatura. É atualizado pelos downloads concluídos e por uma
+    comparação barata do diretório (os.scandir), feita só quando o mtime
+    do diretório muda.
+    """
+
+    def __init__(self, root_dir: str, db_path: Optional[str] = None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.db_path = db_path or os.path.join(app_data_dir(), "library.sqlite3")
+        self.lock = Lock()
+        self._dir_mtime: Optional[int] = None
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    # ============================================================
+    # SINCRONIZAÇÃO COM O DIRETÓRIO
+    # ============================================================
+    @staticmethod
+    def _wanted(name: str) -> bool:
+        return (
+            not name.startswith(".")
+            and not name.endswith(IGNORED_SUFFIXES)
+            and not INTERMEDIATE_RE.search(name)
+        )
+
+    def sync(self, force: bool = False) -> Dict[str, List[str]]:
+        """
+        Compara o diretório com o índice e aplica só as diferenças.
+        Retorna os caminhos incluídos/alterados ("updated") e "removed".
+        """
+        delta: Dict[str, List[str]] = {"updated": [], "removed": []}
+        try:
+            dir_mtime = os.stat(self.root_dir).st_mtime_ns
+        except OSError:
+            return delta
+        if not force and dir_mtime == self._dir_mtime:
+            return delta
+
+        on_disk: Dict[str, os.stat_result] = {}
+        with os.scandir(self.root_dir) as it:
+            for item in it:
+                if self._wanted(item.name) and item.is_file():
+                    try:
+                        on_disk[item.path] = item.stat()
+                    except OSError:
+                        continue
+
+        with self.lock:
+            known = {
+                row["path"]: (row["mtime"], row["size"])
+                for row in self._conn.execute("SELECT path, mtime, size FROM files")
+            }
+            removed = [path for path in known if path not in on_disk]
+            delta = self._apply_locked(on_disk, known, removed)
+            self._dir_mtime = dir_mtime
+        return delta
+
+    def apply_paths(self, paths: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Atualiza só os caminhos informados (eventos do watcher): os que
+        existem são incluídos/alterados, os que sumiram são removidos.
+        """
+        on_disk: Dict[str, os.stat_result] = {}
+        missing: List[str] = []
+        for path in {os.path.abspath(p) for p in paths}:
+            if os.path.dirname(path) != self.root_dir:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                missing.append(path)
+                continue
+            if self._wanted(os.path.basename(path)) and os.path.isfile(path):
+                on_disk[path] = st
+            else:
+                missing.append(path)
+        with self.lock:
+            known: Dict[str, Any] = {}
+            for path in list(on_disk) + missing:
+                row = self._conn.execute(
+                    "SELECT mtime, size FROM files WHERE path = ?", (path,)
+                ).fetchone()
+                if row:
+                    known[path] = (row["mtime"], row["size"])
+            removed = [path for path in missing if path in known]
+            return self._apply_locked(on_disk, known, removed)
+
+    def _apply_locked(
+        self,
+        on_disk: Dict[str, os.stat_result],
+        known: Dict[str, Any],
+        removed: List[str],
+    ) -> Dict[str, List[str]]:
+        now = time.time()
+        upserts = [
+            (path, os.path.basename(path), st.st_size, st.st_mtime_ns, now)
+            for path, st in on_disk.items()
+            if known.get(path) != (st.st_mtime_ns, st.st_size)
+        ]
+        with self._conn:
+            # Arquivos alterados mantêm os metadados de origem já conhecidos
+            self._conn.executemany(
+                "INSERT INTO files (path, name, size, mtime, added_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET"
+                " size = excluded.size, mtime = excluded.mtime, thumbnail = NULL",
+                upserts,
+            )
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in removed]
+            )
+        return {"updated": [row[0] for row in upserts], "removed": removed}
+
+    def record_download(self, entry: Dict[str, Any]) -> None:
+        """Inclui um download concluído com os metadados de origem."""
+        path = entry.get("final_path")
+        if not path:
+            return
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self.lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO files"
+                " (path, name, size, mtime, duration, url, title, uploader, added_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET"
+                " size = excluded.size, mtime = excluded.mtime,"
+                " duration = excluded.duration, url = excluded.url,"
+                " title = excluded.title, uploader = excluded.uploader,"
+                " thumbnail = NULL",
+                (
+                    path,
+                    os.path.basename(path),
+                    st.st_size,
+                    st.st_mtime_ns,
+                    entry.get("duration"),
+                    entry.get("url"),
+                    entry.get("title"),
+                    entry.get("uploader"),
+                    time.time(),
+                ),
+            )
+
+    def set_thumbnail(self, path: str, thumbnail: Optional[str]) -> None:
+        with self.lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET thumbnail = ? WHERE path = ?",
+                (thumbnail, os.path.abspath(path)),
+            )
+
+    def remove(self, path: str) -> None:
+        with self.lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    # ============================================================
+    # CONSULTA
+    # ============================================================
+    @staticmethod
+    def _where(search: str):
+        if not search:
+            return "", ()
+        pattern = f"%{search.strip()}%"
+        return (
+            " WHERE name LIKE ? OR title LIKE ? OR uploader LIKE ?",
+            (pattern, pattern, pattern),
+        )
+
+    def query(
+        self,
+        search: str = "",
+        sort: str = "recent",
+        descending: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Uma página da biblioteca, filtrada por nome/título/canal."""
+        where, params = self._where(search)
+        order = SORT_COLUMNS.get(sort, SORT_COLUMNS["recent"])
+        direction = "DESC" if descending else "ASC"
+        with self.lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM files{where} ORDER BY {order} {direction}, path"
+                " LIMIT ? OFFSET ?",
+                params + (int(limit), int(offset)),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT * FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def urls(self) -> List[str]:
+        """Links de origem dos arquivos conhecidos (para evitar downloads repetidos)."""
+        with self.lock:
+            rows = self._conn.execute(
+                "SELECT url FROM files WHERE url IS NOT NULL"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, search: str = "") -> int:
+        where, params = self._where(search)
+        with self.lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM files{where}", params
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self._conn.close()
@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Set
+from .library_index import LibraryIndex
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog é opcional: sem ele o diretório é consultado periodicamente
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, mark: Callable[[str], None]):
+        super().__init__()
+        self._mark = mark
+
+    def on_any_event(self, event) -> None:
+        if event.is_directory:
+            return
+        self._mark(event.src_path)
+        dest = getattr(event, "dest_path", None)
+        if dest:
+            self._mark(dest)
+
+
+class LibraryWatcher:
+    """
+    Observa o diretório de downloads (inotify/FSEvents via watchdog, ou
+    consulta periódica como alternativa) e aplica no índice só os arquivos
+    que mudaram. Rajadas de eventos são agrupadas até o diretório ficar
+    quieto por `debounce` segundos, mas nenhum lote espera mais que
+    `max_delay`. Temporários de downloads em andamento (.part, .ytdl,
+    .fNNN) são ignorados já na chegada.
+    """
+
+    def __init__(
+        self,
+        library: LibraryIndex,
+        on_change: Optional[Callable[[Dict[str, List[str]]], None]] = None,
+        debounce: float = 0.5,
+        max_delay: float = 2.0,
+        poll_interval: float = 5.0,
+        use_events: bool = True,
+    ):
+        self.library = library
+        self.on_change = on_change
+        self.debounce = debounce
+        self.max_delay = max(debounce, max_delay)
+        self.poll_interval = poll_interval
+        self.use_events = use_events and Observer is not None
+        self.mode: Optional[str] = None  # "events" ou "polling" depois do start()
+
+        self._pending: Set[str] = set()
+        self._first_event = 0.0
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        if self.use_events:
+            try:
+                observer = Observer()
+                observer.schedule(
+                    _EventHandler(self._mark), self.library.root_dir, recursive=False
+                )
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+                self.mode = "events"
+            except Exception as e:
+                # Ex.: limite de inotify ou armazenamento sem suporte a eventos
+                print(f"[LibraryWatcher] Eventos indisponíveis, usando consulta: {e}")
+        if self._observer is None:
+            self.mode = "polling"
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+
+    # ============================================================
+    # EVENTOS
+    # ============================================================
+    def _mark(self, path: str) -> None:
+        # A escrita contínua de um .part nunca deixaria o diretório quieto
+        if not LibraryIndex._wanted(os.path.basename(path)):
+            return
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._pending.add(path)
+            self._last_event = now
+            self._cond.notify()
+
+    def _take_pending(self) -> Set[str]:
+        """
+        Espera os eventos pararem por `debounce` segundos (ou o lote
+        completar `max_delay` segundos) e retira o lote.
+        """
+        with self._cond:
+            while not self._stop.is_set():
+                if self._pending:
+                    now = time.monotonic()
+                    remaining = min(
+                        self._last_event + self.debounce,
+                        self._first_event + self.max_delay,
+                    ) - now
+                    if remaining <= 0:
+                        paths, self._pending = self._pending, set()
+                        return paths
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+        return set()
+
+    def _run(self) -> None:
+        # Recupera o que mudou com o app fechado
+        self._apply(self.library.sync)
+        while not self._stop.is_set():
+            if self.mode == "polling":
+                # sync() só varre o diretório quando o mtime dele mudou
+                self._stop.wait(self.poll_interval)
+                if not self._stop.is_set():
+                    self._apply(self.library.sync)
+            else:
+                paths = self._take_pending()
+                if paths:
+                    self._apply(lambda: self.library.apply_paths(paths))
+
+    def _apply(self, update: Callable[[], Dict[str, List[str]]]) -> None:
+        try:
+            delta = update()
+        except Exception as e:
+            print(f"[LibraryWatcher] Erro ao atualizar o índice: {e}")
+            return
+        self._publish(delta)
+
+    def _publish(self, delta: Dict[str, List[str]]) -> None:
+        if not (delta["updated"] or delta["removed"]) or not callable(self.on_change):
+            return
+        try:
+            self.on_change(delta)
+        except Exception as e:
+            print(f"[LibraryWatcher] Erro ao notificar mudanças: {e}")
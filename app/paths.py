@@ -0,0 +1,18 @@
+import os
+
+ANDROID_APP_DIR = "/storage/emulated/0/Android/data/com.vxncius.snapdl/files"
+
+
+def is_android() -> bool:
+    return os.path.exists("/storage/emulated/0")
+
+
+def app_data_dir(*parts: str) -> str:
+    """Diretório de dados do app (cache, índices, registros), criado sob demanda."""
+    if is_android():
+        base = ANDROID_APP_DIR
+    else:
+        base = os.path.join(os.path.expanduser("~"), ".snapdl")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
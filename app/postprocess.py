@@ -0,0 +1,395 @@
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+# Duração informada pelo ffmpeg no stderr ("Duration: 00:03:12.45")
+DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+LOUDNORM_DEFAULTS = {"I": -16.0, "TP": -1.5, "LRA": 11.0}
+
+
+def _seconds(h: str, m: str, s: str) -> float:
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def _thumbnail_args(job: Dict[str, Any]) -> List[str]:
+    # -ss antes do -i: busca pelo índice em vez de decodificar desde o início
+    params = job["params"]
+    args = ["-ss", str(params.get("at", 1.0)), "-i", job["src"], "-an", "-sn"]
+    args += ["-frames:v", "1"]
+    if params.get("width"):
+        # Largura pedida; a altura segue a proporção (múltiplo de 2)
+        args += ["-vf", f"scale={int(params['width'])}:-2"]
+    return args + ["-q:v", "4", job["dest"]]
+
+
+def _remux_args(job: Dict[str, Any]) -> List[str]:
+    return ["-i", job["src"], "-map", "0", "-c", "copy", job["dest"]]
+
+
+def _loudnorm_args(job: Dict[str, Any]) -> List[str]:
+    values = dict(LOUDNORM_DEFAULTS)
+    values.update(
+        {k: v for k, v in job["params"].items() if k in LOUDNORM_DEFAULTS}
+    )
+    filt = "loudnorm=" + ":".join(f"{k}={v}" for k, v in values.items())
+    # Só o áudio é recodificado; o vídeo, se houver, é copiado
+    return ["-i", job["src"], "-af", filt, "-c:v", "copy", job["dest"]]
+
+
+def _trim_args(job: Dict[str, Any]) -> List[str]:
+    params = job["params"]
+    args = ["-ss", str(params.get("start", 0)), "-i", job["src"]]
+    if params.get("end") is not None:
+        args += ["-t", str(float(params["end"]) - float(params.get("start", 0)))]
+    return args + ["-map", "0", "-c", "copy", job["dest"]]
+
+
+def _transcode_args(job: Dict[str, Any]) -> List[str]:
+    bitrate = job["params"].get("bitrate", "192k")
+    return ["-i", job["src"], "-vn", "-b:a", bitrate, job["dest"]]
+
+
+# Tipo de job -> montagem dos argumentos do ffmpeg
+JOB_TYPES: Dict[str, Callable[[Dict[str, Any]], List[str]]] = {
+    "thumbnail": _thumbnail_args,
+    "remux": _remux_args,
+    "loudnorm": _loudnorm_args,
+    "trim": _trim_args,
+    "transcode": _transcode_args,
+}
+
+
+class PostProcessPipeline:
+    """
+    Fila limitada de jobs do ffmpeg (miniatura, remux, normalização de
+    volume, corte, conversão). O número de jobs simultâneos acompanha os
+    núcleos da CPU e cai enquanto há downloads ativos; as threads do ffmpeg
+    são divididas entre os jobs para não sobrecarregar a CPU.
+    """
+
+    def __init__(
+        self,
+        ffmpeg: Any,
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        max_history: int = 200,
+        load_provider: Optional[Callable[[], int]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.ffmpeg = ffmpeg  # FFmpegHelper (usa ffmpeg_path)
+        self.cpu_count = os.cpu_count() or 2
+        self.max_workers = max(1, max_workers or self.cpu_count)
+        self.load_provider = load_provider  # nº de downloads ativos
+        self.on_progress = on_progress
+        self.max_history = max_history
+
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._finished: List[str] = []
+        self._jobs_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._running = 0
+        self._slots = threading.Condition()
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._worker, daemon=True, name=f"ffmpeg-{i}")
+            for i in range(self.max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # ============================================================
+    # CONTROLE DE CARGA
+    # ============================================================
+    def _active_downloads(self) -> int:
+        if not callable(self.load_provider):
+            return 0
+        try:
+            return max(0, int(self.load_provider()))
+        except Exception:
+            return 0
+
+    def concurrency_limit(self) -> int:
+        """Jobs simultâneos permitidos agora: um núcleo reservado por download."""
+        return max(1, min(self.max_workers, self.cpu_count - self._active_downloads()))
+
+    def _threads_per_job(self) -> int:
+        # Só os núcleos livres de downloads são divididos entre os jobs
+        free = self.cpu_count - self._active_downloads()
+        return max(1, free // self.concurrency_limit())
+
+    def _acquire_slot(self) -> None:
+        with self._slots:
+            # Reavalia periodicamente: a carga muda quando downloads terminam
+            while self._running >= self.concurrency_limit():
+                self._slots.wait(timeout=1.0)
+            self._running += 1
+
+    def _release_slot(self) -> None:
+        with self._slots:
+            self._running -= 1
+            self._slots.notify_all()
+
+    # ============================================================
+    # API
+    # ============================================================
+    def submit(
+        self,
+        job_type: str,
+        src: str,
+        dest: str,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        duration: Optional[float] = None,
+        block: bool = True,
+        **params,
+    ) -> str:
+        """
+        Enfileira um job e retorna seu id. Com a fila cheia, bloqueia (ou
+        levanta queue.Full se block=False). `callback` recebe o job ao fim.
+        """
+        return self.submit_job(
+            job_type, src, dest, callback, duration, block, **params
+        )["id"]
+
+    def submit_job(
+        self,
+        job_type: str,
+        src: str,
+        dest: str,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        duration: Optional[float] = None,
+        block: bool = True,
+        **params,
+    ) -> Dict[str, Any]:
+        """
+        Como `submit`, mas retorna o próprio job: quem o guarda pode esperar
+        por `job["done"]` mesmo depois que ele sair do histórico.
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Tipo de job desconhecido: {job_type}")
+        if self._closed:
+            raise RuntimeError("Pipeline de pós-processamento encerrado.")
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "type": job_type,
+            "src": src,
+            "dest": dest,
+            "params": params,
+            "callback": callback,
+            "status": "queued",
+            "progress": 0.0,
+            "duration": duration,
+            "error": None,
+            "process": None,
+            "queued_at": time.monotonic(),
+            "started_at": None,
+            "finished_at": None,
+            "done": threading.Event(),
+        }
+        if job_type == "trim" and duration is None and params.get("end") is not None:
+            job["duration"] = float(params["end"]) - float(params.get("start", 0))
+        self.jobs[job_id] = job
+        try:
+            self._queue.put(job_id, block=block)
+        except queue.Full:
+            self.jobs.pop(job_id, None)
+            raise
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Só os `max_history` jobs terminados mais recentes ficam guardados
+            raise LookupError(
+                f"Job desconhecido ou já descartado do histórico: {job_id}"
+            )
+        job["done"].wait(timeout)
+        return job
+
+    def run(self, job_type: str, src: str, dest: str, **params) -> Dict[str, Any]:
+        """Enfileira e espera o job terminar."""
+        job = self.submit_job(job_type, src, dest, **params)
+        job["done"].wait()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        with self._jobs_lock:
+            job = self.jobs.get(job_id)
+            if not job or job["status"] not in ("queued", "running"):
+                return False
+            was_queued = job["status"] == "queued"
+            job["status"] = "cancelled"
+        proc = job.get("process")
+        if proc and proc.poll() is None:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+        if was_queued:
+            # Ainda na fila: o worker descarta ao retirar
+            self._finish(job)
+        return True
+
+    def timings(self, job_id: str) -> Dict[str, Optional[float]]:
+        """Tempo na fila e de execução do job, em segundos."""
+        job = self.jobs.get(job_id) or {}
+        queued = job.get("queued_at")
+        started = job.get("started_at")
+        finished = job.get("finished_at")
+        left_queue = started or finished
+        return {
+            "wait": left_queue - queued if queued and left_queue else None,
+            "run": finished - started if started and finished else None,
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+
+    # ============================================================
+    # EXECUÇÃO
+    # ============================================================
+    def _worker(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self._acquire_slot()
+            with self._jobs_lock:
+                job = self.jobs.get(job_id)
+                if not job or job["status"] != "queued":
+                    self._release_slot()
+                    continue
+                job["status"] = "running"
+            try:
+                self._execute(job)
+            finally:
+                self._release_slot()
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        ffmpeg_path = getattr(self.ffmpeg, "ffmpeg_path", None)
+        if not ffmpeg_path:
+            job["status"] = "error"
+            job["error"] = "FFmpeg não disponível."
+            self._finish(job)
+            return
+
+        args = JOB_TYPES[job["type"]](job)
+        # -threads antes da saída limita o encoder à parte deste job nos núcleos
+        cmd = (
+            [ffmpeg_path, "-hide_banner", "-y", "-nostats", "-progress", "pipe:1"]
+            + args[:-1]
+            + ["-threads", str(self._threads_per_job()), args[-1]]
+        )
+        job["started_at"] = time.monotonic()
+        stderr_tail: List[str] = []
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+        except Exception as exc:
+            job["status"] = "error"
+            job["error"] = str(exc)
+            self._finish(job)
+            return
+        job["process"] = proc
+        if job["status"] == "cancelled":  # cancelado enquanto abria o processo
+            proc.terminate()
+
+        reader = threading.Thread(
+            target=self._read_stderr, args=(job, proc, stderr_tail), daemon=True
+        )
+        reader.start()
+        self._read_progress(job, proc)
+        proc.wait()
+        reader.join(timeout=1.0)
+
+        if job["status"] == "cancelled":
+            self._remove_partial(job)
+        elif proc.returncode == 0 and os.path.exists(job["dest"]):
+            job["status"] = "completed"
+            job["progress"] = 100.0
+        else:
+            job["status"] = "error"
+            job["error"] = (
+                stderr_tail[-1] if stderr_tail else f"ffmpeg saiu com {proc.returncode}"
+            )
+            self._remove_partial(job)
+        self._finish(job)
+
+    def _read_stderr(self, job: Dict[str, Any], proc, tail: List[str]) -> None:
+        for line in proc.stderr:
+            line = line.strip()
+            if not line:
+                continue
+            if job["duration"] is None:
+                match = DURATION_RE.search(line)
+                if match:
+                    job["duration"] = _seconds(*match.groups())
+            tail.append(line)
+            del tail[:-20]
+
+    def _read_progress(self, job: Dict[str, Any], proc) -> None:
+        """Lê os blocos chave=valor do `-progress pipe:1`."""
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" or key == "out_time_ms":
+                # Ambas vêm em microssegundos (out_time_ms é um nome antigo)
+                try:
+                    position = int(value) / 1_000_000
+                except ValueError:
+                    continue
+                if job["duration"]:
+                    pct = position * 100.0 / job["duration"]
+                    job["progress"] = max(0.0, min(99.9, pct))
+            elif key == "progress":
+                if value == "end":
+                    job["progress"] = 100.0
+                self._emit_progress(job)
+
+    def _remove_partial(self, job: Dict[str, Any]) -> None:
+        if job["dest"] != job["src"] and os.path.exists(job["dest"]):
+            try:
+                os.remove(job["dest"])
+            except OSError:
+                pass
+
+    def _emit_progress(self, job: Dict[str, Any]) -> None:
+        if callable(self.on_progress):
+            try:
+                self.on_progress(job)
+            except Exception:
+                pass
+
+    def _finish(self, job: Dict[str, Any]) -> None:
+        job["finished_at"] = time.monotonic()
+        job["process"] = None
+        with self._jobs_lock:
+            # Mantém só os jobs terminados mais recentes
+            self._finished.append(job["id"])
+            while len(self._finished) > self.max_history:
+                self.jobs.pop(self._finished.pop(0), None)
+        self._emit_progress(job)
+        job["done"].set()
+        callback = job.get("callback")
+        if callable(callback):
+            try:
+                callback(job)
+            except Exception:
+                pass
@@ -0,0 +1,75 @@
+import threading
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class ProgressRecord(NamedTuple):
+    """Registro imutável e compacto do progresso de um download."""
+
+    id: str
+    status: str
+    progress: float
+    phase: str = "download"  # "download" ou "postprocess:<Nome>"
+    downloaded_bytes: Optional[float] = None
+    total_bytes: Optional[float] = None
+    speed: Optional[float] = None
+    speed_avg: Optional[float] = None
+    eta: Optional[float] = None
+    fragment_index: Optional[float] = None
+    fragment_count: Optional[float] = None
+
+
+class ProgressBus:
+    """
+    Agrupa as atualizações de progresso: guarda só a mais recente de cada
+    download e entrega todas juntas, no máximo `rate_hz` vezes por segundo.
+    """
+
+    def __init__(
+        self,
+        on_batch: Optional[Callable[[List[ProgressRecord]], None]] = None,
+        rate_hz: float = 5.0,
+    ):
+        self.on_batch = on_batch
+        self.interval = 1.0 / rate_hz if rate_hz > 0 else 0.2
+        self.lock = Lock()
+        # Serializa as entregas: um flush() explícito nunca passa à frente
+        # de um lote que a thread do barramento já está entregando
+        self._deliver_lock = Lock()
+        self._latest: Dict[str, ProgressRecord] = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, record: ProgressRecord) -> None:
+        with self.lock:
+            self._latest[record.id] = record
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def flush(self) -> None:
+        """Entrega imediatamente o que estiver pendente."""
+        with self._deliver_lock:
+            with self.lock:
+                batch = list(self._latest.values())
+                self._latest.clear()
+            if batch and callable(self.on_batch):
+                try:
+                    self.on_batch(batch)
+                except Exception:
+                    pass
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            # Dorme até haver novidades, depois no máximo uma entrega por intervalo
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+            self._stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        self.flush()
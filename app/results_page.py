@@ -1,26 +1,7 @@
 import flet as ft
-import flet_video as fv
-from yt_dlp import YoutubeDL
 import threading
 
 
-def get_streaming_url(youtube_url):
-    try:
-        ydl_opts = {
-            "format": "best[ext=mp4]",
-            "noplaylist": True,
-            "quiet": True,
-        }
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(youtube_url, download=False)
-            streaming_url = info.get("url", youtube_url)
-            # print(f"URL de streaming obtida: {streaming_url}")
-            return streaming_url
-    except Exception as e:
-        print(f"Erro ao obter URL de streaming: {e}")
-        return None
-
-
 def results_page(self, w):
     def go_back(e):
         self.page.controls.clear()
@@ -36,7 +17,8 @@ def results_page(self, w):
         on_click=go_back,
     )
 
-    if not self.search_result.get("success", False):
+    loading = self.search_result.get("loading", False)
+    if not self.search_result.get("success", False) and not loading:
         content = ft.Column(
             [
                 back_button,
@@ -54,12 +36,21 @@ def results_page(self, w):
         )
     else:
         results = self.search_result.get("results", [])
-        result_list = ft.Column(
+        thumb_size_w = w * 0.5 if not self.IS_MOBILE else w * 0.85
+        thumb_size_h = thumb_size_w * 9 / 16
+        # Altura fixa de cada item: permite calcular a janela visível pelo scroll
+        slot_h = thumb_size_h + 100
+        thumb_px = (int(thumb_size_w), int(thumb_size_h))
+        virtualize = self.VIRTUALIZE_RESULTS
+
+        def on_scroll(e: ft.OnScrollEvent):
+            update_window(e.pixels, e.viewport_dimension)
+
+        result_list = ft.ListView(
             controls=[],
-            spacing=10,
-            scroll=ft.ScrollMode.AUTO,
-            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             expand=True,
+            on_scroll=on_scroll if virtualize else None,
+            on_scroll_interval=50,
         )
 
         def create_video_card(result):
@@ -68,8 +59,6 @@ def results_page(self, w):
             thumb = result.get("thumbnail", "")
             duration = result.get("duration", "")
             url = result.get("url", "")
-            thumb_size_w = w * 0.5 if not self.IS_MOBILE else w * 0.85
-            thumb_size_h = thumb_size_w * 9 / 16
             card_content_ref = ft.Ref[ft.Container]()
             is_video = False
 
@@ -78,7 +67,9 @@ def results_page(self, w):
                     content=ft.Stack(
                         [
                             ft.Image(
-                                src=thumb,
+                                src=self.thumbnail_cache.source(
+                                    thumb, thumb_px[0], thumb_px[1]
+                                ),
                                 width=thumb_size_w,
                                 height=thumb_size_h,
                                 fit=ft.ImageFit.COVER,
@@ -107,6 +98,8 @@ def results_page(self, w):
                 )
 
             def create_video_player(streaming_url):
+                import flet_video as fv
+
                 return ft.Container(
                     content=fv.Video(
                         playlist=[fv.VideoMedia(streaming_url)],
@@ -160,7 +153,7 @@ def results_page(self, w):
 
             def load_streaming_url(video_url, video_title):
                 self.log(f"Iniciando carregamento da URL para {video_title}")
-                streaming_url = get_streaming_url(video_url)
+                streaming_url = self.stream_resolver.resolve(video_url)
                 if streaming_url:
                     # self.log(f"URL válida obtida: {streaming_url}")
                     toggle_content(True, streaming_url)
@@ -192,10 +185,15 @@ def results_page(self, w):
                     ).start()
 
             def open_download_sheet(url, title, uploader, thumb):
-                def handle_choice(e, only_audio=False):
+                def handle_choice(e, only_audio=False, audio_format=None):
                     self.page.close(bottom_sheet)
                     self.download_video(
-                        url, title, uploader, thumb, only_audio=only_audio
+                        url,
+                        title,
+                        uploader,
+                        thumb,
+                        only_audio=only_audio,
+                        audio_format=audio_format,
                     )
 
                 bottom_sheet = ft.BottomSheet(
@@ -225,7 +223,7 @@ def results_page(self, w):
                                     color=self.colors["text"],
                                 ),
                                 ft.ElevatedButton(
-                                    text="Baixar como Áudio (MP3)",
+                                    text="Baixar como Áudio (original)",
                                     icon=ft.Icons.AUDIO_FILE,
                                     on_click=lambda e: handle_choice(
                                         e, only_audio=True
@@ -233,6 +231,15 @@ def results_page(self, w):
                                     bgcolor=self.colors["secondary"],
                                     color=self.colors["text"],
                                 ),
+                                ft.ElevatedButton(
+                                    text="Baixar como Áudio (MP3)",
+                                    icon=ft.Icons.AUDIO_FILE,
+                                    on_click=lambda e: handle_choice(
+                                        e, only_audio=True, audio_format="mp3"
+                                    ),
+                                    bgcolor=self.colors["secondary"],
+                                    color=self.colors["text"],
+                                ),
                             ],
                         ),
                     ),
@@ -304,8 +311,92 @@ def results_page(self, w):
                 elevation=0,
             )
 
-        for result in results:
-            result_list.controls.append(create_video_card(result))
+        loader = ft.Container(
+            content=ft.ProgressRing(
+                width=24, height=24, stroke_width=2, color=self.colors["primary"]
+            ),
+            alignment=ft.alignment.center,
+            padding=ft.padding.all(20),
+        )
+        render_lock = threading.Lock()
+        slots = []  # um container leve por resultado, reaproveitado no scroll
+        built = set()  # índices com card construído
+        viewport = {"pixels": 0.0, "height": float(self.height or 720)}
+        buffer = 3
+
+        def visible_range():
+            if not virtualize:
+                return range(len(slots))
+            first = int(viewport["pixels"] // slot_h) - buffer
+            last = int((viewport["pixels"] + viewport["height"]) // slot_h) + buffer
+            return range(max(0, first), min(len(slots), last + 1))
+
+        def apply_window():
+            # Constrói os cards da janela e recicla os que saíram dela
+            wanted = set(visible_range())
+            for i in built - wanted:
+                slots[i].content = None
+            for i in wanted - built:
+                slots[i].content = create_video_card(results[i])
+            built.clear()
+            built.update(wanted)
+            # Resolve de antemão o streaming dos primeiros cards visíveis
+            first_visible = int(viewport["pixels"] // slot_h)
+            self.stream_resolver.preresolve(
+                results[i].get("url", "")
+                for i in range(first_visible, first_visible + self.PRERESOLVE_COUNT)
+                if i in wanted
+            )
+            # Antecipa as thumbnails da próxima "página" de resultados
+            if wanted:
+                start = max(wanted) + 1
+                upcoming = results[start : start + len(wanted)]
+                self.thumbnail_cache.prefetch(
+                    [r.get("thumbnail", "") for r in upcoming], *thumb_px
+                )
+
+        def update_window(pixels, height):
+            with render_lock:
+                viewport["pixels"] = pixels or 0.0
+                viewport["height"] = height or viewport["height"]
+                before = set(built)
+                apply_window()
+                changed = before != built
+            if changed:
+                result_list.update()
+
+        def sync_results():
+            with render_lock:
+                for _ in range(len(slots), len(results)):
+                    slots.append(
+                        ft.Container(height=slot_h, alignment=ft.alignment.top_center)
+                    )
+                apply_window()
+                result_list.controls = list(slots)
+                if self.search_result.get("loading", False):
+                    result_list.controls.append(loader)
+                elif not results:
+                    result_list.controls.append(
+                        ft.Text(
+                            "Nenhum resultado encontrado ou ocorreu um erro.",
+                            color=self.colors["text"],
+                            size=20,
+                            text_align=ft.TextAlign.CENTER,
+                        )
+                    )
+
+        def on_search_update():
+            sync_results()
+            try:
+                result_list.update()
+            except Exception:
+                # A lista ainda não foi adicionada à página
+                pass
+
+        # Registra antes da primeira renderização para não perder o fim da busca
+        if loading:
+            self.on_search_update = on_search_update
+        sync_results()
 
         list_content = [result_list]
         if not self.IS_MOBILE:
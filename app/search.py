@@ -1,14 +1,47 @@
 import time
 import traceback
-import uyts
+import threading
 import re
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterator, List, Optional, Set
 from urllib.parse import urlparse
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import ExtractorError, DownloadError
+from .search_cache import SearchCache
+from .format_selector import compact_formats
+
+
+class RateLimiter:
+    """Limita o número de requisições por segundo entre várias threads."""
+
+    def __init__(self, rate: float = 5.0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
 
 
 class SearchManager:
-    def __init__(self): ...
+    def __init__(
+        self,
+        max_workers: int = 4,
+        requests_per_second: float = 5.0,
+        cache: Optional[SearchCache] = None,
+        use_cache: bool = True,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache = (cache or SearchCache()) if use_cache else None
+        self._local = threading.local()
 
     def normalize_title(self, title: str) -> str:
         return title.strip().lower()
@@ -30,55 +63,210 @@ class SearchManager:
             return "https://" + url.strip()
         return url.strip()
 
+    def _cache_get(self, *parts) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        return self.cache.get(SearchCache.make_key(*parts))
+
+    def _cache_set(self, value: dict, *parts) -> None:
+        if self.cache is not None and not value.get("error"):
+            self.cache.set(SearchCache.make_key(*parts), value)
+
+    def _ydl(self, flat: bool = False):
+        """Instância de YoutubeDL reaproveitada por thread (completa ou rasa)."""
+        # Importado sob demanda: yt_dlp é pesado e atrasaria a inicialização
+        from yt_dlp import YoutubeDL
+
+        name = "ydl_flat" if flat else "ydl"
+        ydl = getattr(self._local, name, None)
+        if ydl is None:
+            opts = {"quiet": True, "skip_download": True, "no_warnings": True}
+            if flat:
+                # Só lista as entradas de playlists/canais, sem abrir cada vídeo
+                opts["extract_flat"] = "in_playlist"
+            else:
+                opts.update({"format": "best", "noplaylist": True})
+            ydl = YoutubeDL(opts)
+            setattr(self._local, name, ydl)
+        return ydl
+
+    @staticmethod
+    def _video_from_info(info: Dict, url: str) -> dict:
+        return {
+            "id": info.get("id", ""),
+            "extractor": info.get("extractor_key", ""),
+            "title": info.get("title", "Título desconhecido"),
+            "uploader": info.get("uploader", info.get("channel", "Canal desconhecido")),
+            "url": info.get("webpage_url", url),
+            "thumbnail": info.get("thumbnail", ""),
+            "duration": info.get("duration_string", info.get("duration", "N/A")),
+            "duration_seconds": info.get("duration"),
+            "views": str(info.get("view_count", 0)),
+            "formats": compact_formats(info.get("formats")),
+        }
+
+    @staticmethod
+    def _error_entry(url: str, msg: str) -> dict:
+        return {
+            "title": "Título desconhecido",
+            "uploader": "Canal desconhecido",
+            "url": url,
+            "thumbnail": "",
+            "duration": "N/A",
+            "views": "0",
+            "error": msg,
+        }
+
     def extract_video_metadata(self, url: str) -> dict:
+        from yt_dlp.utils import ExtractorError, DownloadError
+
         url = self.ensure_protocol(url)
+        cached = self._cache_get("url", url)
+        if cached is not None:
+            return cached
 
         try:
-            ydl_opts = {
-                "format": "best",
-                "noplaylist": True,
-                "quiet": True,
-                "skip_download": True,
-            }
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                return {
-                    "title": info.get("title", "Título desconhecido"),
-                    "uploader": info.get(
-                        "uploader", info.get("channel", "Canal desconhecido")
-                    ),
-                    "url": info.get("webpage_url", url),
-                    "thumbnail": info.get("thumbnail", ""),
-                    "duration": info.get(
-                        "duration_string", info.get("duration", "N/A")
-                    ),
-                    "views": str(info.get("view_count", 0)),
-                }
+            info = self._ydl().extract_info(url, download=False)
+            video = self._video_from_info(info, url)
+            self._cache_set(video, "url", url)
+            return video
 
         except (ExtractorError, DownloadError) as e:
             msg = str(e)
             if "login" in msg.lower() or "private" in msg.lower():
                 msg = "Autenticação necessária para acessar este link."
-            return {
-                "title": "Título desconhecido",
-                "uploader": "Canal desconhecido",
-                "url": url,
-                "thumbnail": "",
-                "duration": "N/A",
-                "views": "0",
-                "error": msg,
-            }
+            return self._error_entry(url, msg)
 
         except Exception as e:
-            return {
-                "title": "Título desconhecido",
-                "uploader": "Canal desconhecido",
-                "url": url,
-                "thumbnail": "",
-                "duration": "N/A",
-                "views": "0",
-                "error": str(e),
-            }
+            return self._error_entry(url, str(e))
+
+    # ==============================================================
+    # METADADOS EM LOTE (PLAYLISTS, CANAIS E LISTAS DE LINKS)
+    # ==============================================================
+
+    def expand_urls(self, urls: List[str], max_depth: int = 2) -> Iterator[Dict]:
+        """
+        Primeira passada, rápida: expande playlists/canais com extract_flat
+        e entrega uma entrada rasa (url, id, título...) por vídeo, na ordem.
+        """
+        seen: Set[str] = set()
+        for url in urls:
+            if not url or not url.strip():
+                continue
+            url = self.ensure_protocol(url)
+            try:
+                self.rate_limiter.wait()
+                info = self._ydl(flat=True).extract_info(url, download=False)
+            except Exception as e:
+                yield self._error_entry(url, str(e))
+                continue
+            for entry in self._flat_entries(info, url, max_depth):
+                key = self._dedup_key(entry) if entry.get("id") else entry["url"]
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield entry
+
+    def _flat_entries(self, info: Dict, url: str, depth: int) -> Iterator[Dict]:
+        if info.get("_type") not in ("playlist", "multi_video"):
+            if info.get("formats"):
+                # Link de um vídeo só: a passada rasa já trouxe tudo
+                video = self._video_from_info(info, url)
+                self._cache_set(video, "url", url)
+                yield video
+            else:
+                yield self._flat_video(info, url)
+            return
+        playlist = info.get("title")
+        for entry in info.get("entries") or []:
+            if not entry:
+                continue
+            entry_url = entry.get("url") or entry.get("webpage_url")
+            if not entry_url:
+                continue
+            is_list = entry.get("_type") == "playlist" or str(
+                entry.get("ie_key", "")
+            ).endswith(("Tab", "Playlist"))
+            if is_list:
+                # Canais vêm como abas (Vídeos, Shorts...) que também são listas
+                if depth <= 1:
+                    continue
+                try:
+                    self.rate_limiter.wait()
+                    sub = self._ydl(flat=True).extract_info(entry_url, download=False)
+                except Exception as e:
+                    print(f"[SearchManager] Erro ao expandir {entry_url}: {e}")
+                    continue
+                yield from self._flat_entries(sub, entry_url, depth - 1)
+                continue
+            video = self._flat_video(entry, entry_url)
+            video["playlist"] = playlist
+            yield video
+
+    @staticmethod
+    def _flat_video(info: Dict, url: str) -> Dict:
+        return {
+            "id": info.get("id", ""),
+            "title": info.get("title") or "Título desconhecido",
+            "uploader": info.get("uploader")
+            or info.get("channel")
+            or "Canal desconhecido",
+            "url": info.get("webpage_url") or url,
+            "thumbnail": info.get("thumbnail")
+            or (info.get("thumbnails") or [{}])[-1].get("url", ""),
+            "duration": info.get("duration_string", info.get("duration", "N/A")),
+            "duration_seconds": info.get("duration"),
+            "views": str(info.get("view_count") or 0),
+        }
+
+    def iter_batch_metadata(
+        self,
+        urls: List[str],
+        hydrate: bool = True,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        Metadados de vários links (ou de uma playlist/canal), entregues na
+        ordem de entrada à medida que ficam prontos. Depois da passada rasa,
+        os metadados completos (com formatos) são buscados em paralelo, com
+        um número limitado de vídeos em andamento.
+        """
+        flat = self.expand_urls(urls)
+        if not hydrate:
+            yield from flat
+            return
+
+        workers = max(1, max_workers or self.max_workers)
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metadata")
+        pending: Deque[Future] = deque()
+        try:
+            for entry in flat:
+                pending.append(pool.submit(self._hydrate, entry))
+                # Limita o que fica em memória/andamento à frente do consumidor
+                while len(pending) >= workers * 2 or (pending and pending[0].done()):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Se o consumidor desistir, os vídeos pendentes são descartados
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def batch_metadata(self, urls: List[str], hydrate: bool = True) -> List[Dict]:
+        return list(self.iter_batch_metadata(urls, hydrate=hydrate))
+
+    def _hydrate(self, entry: Dict) -> Dict:
+        if entry.get("error"):
+            return entry
+        self.rate_limiter.wait()
+        video = self.extract_video_metadata(entry["url"])
+        if video.get("error"):
+            # Mantém o que a passada rasa já sabia (título, canal...)
+            return dict(entry, error=video["error"])
+        if entry.get("playlist"):
+            video = dict(video, playlist=entry["playlist"])
+        return video
 
     def search_youtube(self, query: str, total_pages: int = 1) -> dict:
         result_data = {
@@ -106,51 +294,100 @@ class SearchManager:
                 traceback.print_exc()
             return result_data
 
-        added_titles = set()
+        try:
+            result_data["results"] = list(self.iter_search_youtube(query, total_pages))
+            result_data["success"] = True
+            # print(f"[SearchManager] Resultados finais: {len(result_data['results'])} vídeos")
+        except Exception as e:
+            result_data["error"] = str(e)
+            traceback.print_exc()
+
+        return result_data
+
+    def iter_search_youtube(self, query: str, total_pages: int = 1) -> Iterator[Dict]:
+        """Gera os vídeos à medida que cada página fica pronta, na ordem das páginas."""
+        if not query or not query.strip():
+            return
+        if self.is_url(query):
+            yield self.extract_video_metadata(query)
+            return
+
+        cache_parts = ("search", self.normalize_title(query), total_pages)
+        cached = self._cache_get(*cache_parts)
+        if cached is not None:
+            yield from cached["results"]
+            return
+
+        seen: Set[str] = set()
         all_results = []
+        for videos in self._iter_pages(query, total_pages):
+            for video in self._merge_page(videos, seen):
+                all_results.append(video)
+                yield video
 
-        def load_page(page_index: int):
-            term = f"{query} page {page_index + 1}" if page_index > 0 else query
-            try:
-                # print(f"[SearchManager] Buscando: {term}")
-                search = uyts.Search(term)
-                results = getattr(search, "results", [])
-                print(
-                    # f"[SearchManager] Resultados brutos da página {page_index + 1}: {len(results)} itens"
-                )
-                for r in results:
-                    if getattr(r, "resultType", "") != "video":
-                        continue
-                    title = getattr(r, "title", "Título desconhecido")
-                    normalized = self.normalize_title(title)
-                    if normalized in added_titles:
-                        continue
-                    added_titles.add(normalized)
-                    video = {
-                        "title": title,
+        if all_results:
+            self._cache_set(
+                {"query": query, "success": True, "error": None, "results": all_results},
+                *cache_parts,
+            )
+
+    def _load_page(self, query: str, page_index: int) -> List[Dict]:
+        import uyts
+
+        term = f"{query} page {page_index + 1}" if page_index > 0 else query
+        videos = []
+        try:
+            self.rate_limiter.wait()
+            # print(f"[SearchManager] Buscando: {term}")
+            search = uyts.Search(term)
+            for r in getattr(search, "results", []):
+                if getattr(r, "resultType", "") != "video":
+                    continue
+                video_id = getattr(r, "id", "")
+                videos.append(
+                    {
+                        "id": video_id,
+                        "title": getattr(r, "title", "Título desconhecido"),
                         "uploader": getattr(r, "author", "Canal desconhecido"),
-                        "url": f"https://www.youtube.com/watch?v={getattr(r, 'id', '')}",
+                        "url": f"https://www.youtube.com/watch?v={video_id}",
                         "thumbnail": getattr(r, "thumbnail_src", ""),
                         "duration": getattr(r, "duration", "N/A"),
                         "views": getattr(r, "view_count", "0"),
                     }
-                    all_results.append(video)
-                    # print(f"[SearchManager] Vídeo adicionado: {title}")
-
-            except Exception as e:
-                print(f"[SearchManager] Erro ao buscar página {page_index + 1}: {e}")
-                traceback.print_exc()
-
-        try:
-            for i in range(total_pages):
-                load_page(i)
-                if i < total_pages - 1:
-                    time.sleep(0.4)
-            result_data["results"] = all_results
-            result_data["success"] = True
-            # print(f"[SearchManager] Resultados finais: {len(all_results)} vídeos")
+                )
         except Exception as e:
-            result_data["error"] = str(e)
+            print(f"[SearchManager] Erro ao buscar página {page_index + 1}: {e}")
             traceback.print_exc()
+        return videos
 
-        return result_data
+    def _iter_pages(self, query: str, total_pages: int) -> Iterator[List[Dict]]:
+        """Busca as páginas em paralelo e as entrega na ordem das páginas."""
+        if total_pages <= 1:
+            yield self._load_page(query, 0)
+            return
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, total_pages))
+        futures = [pool.submit(self._load_page, query, i) for i in range(total_pages)]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Se o consumidor desistir, as páginas pendentes são descartadas
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def _dedup_key(self, video: Dict) -> str:
+        # O id distingue uploads diferentes com o mesmo título
+        if video.get("id"):
+            return f"id:{video['id']}"
+        return f"title:{self.normalize_title(video.get('title', ''))}"
+
+    def _merge_page(self, videos: List[Dict], seen: Set[str]) -> List[Dict]:
+        merged = []
+        for video in videos:
+            key = self._dedup_key(video)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(video)
+        return merged
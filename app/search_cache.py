@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import copy
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+from .paths import app_data_dir
+
+
+class SearchCache:
+    """
+    Cache de resultados de busca em dois níveis: LRU em memória sobre
+    arquivos JSON em disco, com validade (TTL) por entrada.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: float = 3600.0,
+        max_memory_entries: int = 64,
+        max_disk_entries: int = 500,
+    ):
+        self.cache_dir = cache_dir or app_data_dir("cache", "search")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.ttl = ttl
+        self.max_memory_entries = max(1, max_memory_entries)
+        self.max_disk_entries = max(1, max_disk_entries)
+        self.lock = Lock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ============================================================
+    # CHAVES E ARQUIVOS
+    # ============================================================
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        raw = "\x1f".join(str(p) for p in parts)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, record: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _evict_disk(self) -> None:
+        """Remove os arquivos mais antigos quando o limite é excedido."""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for e in entries[:excess]:
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+    def _remember(self, key: str, record: Dict[str, Any]) -> None:
+        self._memory[key] = record
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    # ============================================================
+    # API
+    # ============================================================
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self.lock:
+            record = self._memory.get(key)
+            if record is not None:
+                self._memory.move_to_end(key)
+        if record is None:
+            record = self._read_disk(key)
+            if record is not None:
+                with self.lock:
+                    self._remember(key, record)
+
+        if record is None or record.get("expires", 0) <= now:
+            if record is not None:
+                self.invalidate(key)
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return copy.deepcopy(record["value"])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        record = {
+            "expires": time.time() + (self.ttl if ttl is None else ttl),
+            "value": copy.deepcopy(value),
+        }
+        with self.lock:
+            self._remember(key, record)
+        self._write_disk(key, record)
+        self._evict_disk()
+
+    def invalidate(self, key: str) -> None:
+        with self.lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        with self.lock:
+            self._memory.clear()
+        for e in os.scandir(self.cache_dir):
+            if e.name.endswith(".json"):
+                try:
+                    os.remove(e.path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
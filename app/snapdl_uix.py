@@ -1,12 +1,18 @@
 from os import path
 from platform import system
 from json import dumps, load
-from time import sleep
+from time import sleep, perf_counter
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import flet as ft
 from flet_permission_handler import PermissionHandler, PermissionType, PermissionStatus
 from .search import SearchManager
 from .downloader import DownloadManager
 from .ffmpeg_helper import FFmpegHelper
+from .thumbnail_cache import ThumbnailCache
+from .stream_resolver import StreamResolver
+from .library_index import LibraryIndex
+from .library_watcher import LibraryWatcher
 from .homepage import homepage
 from .results_page import results_page
 from .downloads_page import downloads_page
@@ -18,13 +24,20 @@ from types import MethodType
 
 class SnapDL:
     def __init__(self):
+        self._startup_t0 = perf_counter()
+        self.startup_timings = {}
+        self._startup_lock = threading.Lock()
         self.DEBUG_MODE = False
         self.IS_MOBILE = 1
+        self.VIRTUALIZE_RESULTS = True
+        self.PRERESOLVE_COUNT = 3
         self.page = None
         self.base_dir = path.dirname(path.abspath(__file__))
-        self.seach_mananger = SearchManager()
-        self.donwload_mananger = DownloadManager()
-        self.ffmpeg_setup = FFmpegHelper()
+        self._start_managers()
+        self._library = None
+        self._library_lock = threading.Lock()
+        self.library_view = {"search": "", "sort": "recent", "page": 0}
+        self.on_library_update = None
         self.homepage = MethodType(homepage, self)
         self.results_page = MethodType(results_page, self)
         self.downloads_page = MethodType(downloads_page, self)
@@ -42,6 +55,13 @@ class SnapDL:
             "search_border": "#3B3B3B",
         }
         self.search_result = {}
+        self.on_search_update = None
+        self._search_lock = threading.Lock()
+        self._search_token = 0
+        self._search_cancel = threading.Event()
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="search"
+        )
         self.current_page = None
         self.current_route = "/"
         if self.DEBUG_MODE:
@@ -64,6 +84,144 @@ class SnapDL:
     def log(self, mesage):
         print(f"[DEBUG] {str(mesage)}")
 
+    # ==============================================================
+    # INICIALIZAÇÃO DOS GERENCIADORES
+    # ==============================================================
+
+    def _start_managers(self):
+        """
+        Constrói os gerenciadores em paralelo, em segundo plano, para que a
+        homepage seja exibida sem esperar pelas sondagens dos binários.
+        """
+        factories = {
+            "search": SearchManager,
+            "download": lambda: DownloadManager(
+                metadata_provider=self._video_metadata,
+                transcoder=self._transcode_audio,
+                on_complete=self._on_download_complete,
+                known_urls=lambda: self.library.urls(),
+            ),
+            "ffmpeg": lambda: FFmpegHelper(load_provider=self._active_downloads),
+            # Lê o índice e os blobs do cache em disco: fora do caminho da 1ª tela
+            "thumbnails": ThumbnailCache,
+            "stream": StreamResolver,
+        }
+        self._startup_pool = ThreadPoolExecutor(
+            max_workers=len(factories), thread_name_prefix="startup"
+        )
+        self._managers = {
+            name: self._startup_pool.submit(self._timed, name, factory)
+            for name, factory in factories.items()
+        }
+        pending = [len(factories)]
+        pending_lock = threading.Lock()
+
+        def on_done(_):
+            with pending_lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                self.mark_startup("managers_ready")
+
+        for future in self._managers.values():
+            future.add_done_callback(on_done)
+        self._startup_pool.shutdown(wait=False)
+
+    def _video_metadata(self, url):
+        # Usado pelo DownloadManager para escolher o formato (resultado em cache)
+        return self.seach_mananger.extract_video_metadata(url)
+
+    def _on_download_complete(self, entry):
+        # Downloads concluídos entram no índice sem esperar a próxima varredura
+        try:
+            self.library.record_download(entry)
+        except Exception as e:
+            self.log(f"Erro ao indexar download: {e}")
+            return
+        self._on_library_change(
+            {"updated": [path.abspath(entry["final_path"])], "removed": []}
+        )
+
+    def _active_downloads(self):
+        # O pós-processamento cede CPU enquanto houver downloads rodando
+        future = self._managers.get("download")
+        if future is None or not future.done() or future.exception():
+            return 0
+        return future.result().active_count()
+
+    def _transcode_audio(self, path, audio_format):
+        # Conversões explícitas (ex.: MP3) rodam na fila de pós-processamento
+        return self.ffmpeg_setup.transcode_audio(path, audio_format)
+
+    def _timed(self, name, factory):
+        t0 = perf_counter()
+        try:
+            return factory()
+        finally:
+            self.startup_timings[name] = perf_counter() - t0
+
+    def mark_startup(self, name):
+        """Registra quanto tempo após o início do app um marco foi atingido."""
+        with self._startup_lock:
+            if name in self.startup_timings:
+                return
+            self.startup_timings[name] = perf_counter() - self._startup_t0
+            done = all(
+                m in self.startup_timings for m in ("first_render", "managers_ready")
+            )
+        if done:
+            self.log_startup_report()
+
+    def log_startup_report(self):
+        report = ", ".join(
+            f"{name}={seconds * 1000:.0f}ms"
+            for name, seconds in sorted(
+                self.startup_timings.items(), key=lambda item: item[1]
+            )
+        )
+        self.log(f"Tempos de inicialização: {report}")
+
+    @property
+    def seach_mananger(self) -> SearchManager:
+        return self._managers["search"].result()
+
+    @property
+    def donwload_mananger(self) -> DownloadManager:
+        return self._managers["download"].result()
+
+    @property
+    def ffmpeg_setup(self) -> FFmpegHelper:
+        return self._managers["ffmpeg"].result()
+
+    @property
+    def thumbnail_cache(self) -> ThumbnailCache:
+        return self._managers["thumbnails"].result()
+
+    @property
+    def stream_resolver(self) -> StreamResolver:
+        return self._managers["stream"].result()
+
+    @property
+    def library(self) -> LibraryIndex:
+        with self._library_lock:
+            if self._library is None:
+                self._library = LibraryIndex(self.donwload_mananger.download_dir)
+                self._library_watcher = LibraryWatcher(
+                    self._library, on_change=self._on_library_change
+                )
+                self._library_watcher.start()
+            return self._library
+
+    def _on_library_change(self, delta):
+        # O downloader acompanha os arquivos gravados para deduplicar sem varrer a pasta
+        future = self._managers.get("download")
+        if future is not None and future.done() and not future.exception():
+            future.result().note_outputs(delta)
+        # Repassa só o que mudou para a página de downloads, se estiver aberta
+        listener = self.on_library_update
+        if callable(listener):
+            listener(delta)
+
     def download_video(
         self,
         url: str,
@@ -71,14 +229,110 @@ class SnapDL:
         uploader: str,
         thumbnail: str = "",
         only_audio: bool = False,
+        audio_format=None,
     ):
         download_id = self.donwload_mananger.add_download(
-            url, title, uploader, thumbnail, only_audio=only_audio
+            url,
+            title,
+            uploader,
+            thumbnail,
+            only_audio=only_audio,
+            audio_format=audio_format,
         )
         self.log(
             f"Iniciando download ({'AUDIO' if only_audio else 'VIDEO'}) ID {download_id}: {title} from {url}"
         )
 
+    def download_many(self, urls, only_audio=False, audio_format=None, chunk=100):
+        """
+        Enfileira vários links (ou playlists/canais) fora da thread da UI.
+        Só a passada rasa dos metadados é feita aqui; formatos e detalhes
+        são buscados por cada download quando ele começa.
+        """
+
+        def worker():
+            batch, total = [], 0
+            try:
+                for item in self.seach_mananger.iter_batch_metadata(urls, hydrate=False):
+                    if item.get("error"):
+                        self.log(f"Link ignorado ({item['url']}): {item['error']}")
+                        continue
+                    batch.append(item)
+                    if len(batch) >= chunk:
+                        total += len(self._enqueue_batch(batch, only_audio, audio_format))
+                        batch = []
+                total += len(self._enqueue_batch(batch, only_audio, audio_format))
+            except Exception as e:
+                self.log(f"Erro ao enfileirar links: {e}")
+            self.log(f"{total} downloads adicionados à fila")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _enqueue_batch(self, batch, only_audio, audio_format):
+        if not batch:
+            return []
+        return self.donwload_mananger.add_downloads(
+            batch, only_audio=only_audio, audio_format=audio_format
+        )
+
+    def run_search(self, query: str) -> bool:
+        """
+        Executa a busca fora da thread da UI. Cada busca recebe um token;
+        uma busca mais nova cancela as anteriores e descarta seus resultados.
+        Retorna False se a mesma consulta já estiver em andamento.
+        """
+        with self._search_lock:
+            current = self.search_result
+            if current.get("loading") and current.get("query") == query:
+                return False
+            self._search_cancel.set()
+            self._search_token += 1
+            token = self._search_token
+            cancel = self._search_cancel = threading.Event()
+            result = {
+                "query": query,
+                "success": True,
+                "error": None,
+                "results": [],
+                "loading": True,
+            }
+            self.search_result = result
+
+        def is_current():
+            return not cancel.is_set() and token == self._search_token
+
+        def notify():
+            if is_current() and callable(self.on_search_update):
+                try:
+                    self.on_search_update()
+                except Exception as e:
+                    self.log(f"Erro ao atualizar resultados: {e}")
+
+        def worker():
+            # Buscas que ficaram obsoletas enquanto esperavam na fila nem começam
+            if not is_current():
+                return
+            results = self.seach_mananger.iter_search_youtube(query)
+            try:
+                for video in results:
+                    if not is_current():
+                        break
+                    if video.get("error"):
+                        result["error"] = video["error"]
+                    result["results"].append(video)
+                    notify()
+            except Exception as e:
+                result["error"] = str(e)
+                self.log(f"Erro na busca: {e}")
+            finally:
+                results.close()
+                result["success"] = bool(result["results"])
+                result["loading"] = False
+                notify()
+
+        self._search_executor.submit(worker)
+        return True
+
     def setup_window(self, page, w, h, screen):
         def handle_minimize(e):
             page.window.minimized = True
@@ -309,6 +563,7 @@ class SnapDL:
         page.on_resume = on_ready
         self.current_page = self.navigator("/", self.width)
         page.add(self.current_page)
+        self.mark_startup("first_render")
 
         def on_resize(e):
             w = page.window.width
@@ -0,0 +1,133 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class StreamResolver:
+    """
+    Resolve URLs de streaming para reprodução inline reaproveitando
+    extratores já aquecidos e guardando o resultado até a URL assinada expirar.
+    Toques do usuário têm um pool próprio e descartam as resoluções
+    especulativas que ainda estão na fila.
+    """
+
+    def __init__(
+        self,
+        stream_format: str = "best[ext=mp4]",
+        max_workers: int = 2,
+        default_ttl: float = 300.0,
+        safety_margin: float = 60.0,
+        max_pending: int = 8,
+    ):
+        self.ydl_opts = {"format": stream_format, "noplaylist": True, "quiet": True}
+        self.default_ttl = default_ttl
+        self.safety_margin = safety_margin
+        self.max_pending = max_pending
+        self.lock = Lock()
+        self._cache: Dict[str, Tuple[str, float]] = {}
+        self._pending: Dict[str, Future] = {}  # especulativas (preresolve)
+        self._taps: Dict[str, Future] = {}  # pedidas pelo usuário (resolve)
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._tap_pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    # ============================================================
+    # EXTRAÇÃO
+    # ============================================================
+    def _get_ydl(self):
+        # Cada thread do pool mantém seu próprio YoutubeDL vivo
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            from yt_dlp import YoutubeDL
+
+            ydl = YoutubeDL(self.ydl_opts)
+            self._local.ydl = ydl
+        return ydl
+
+    def _expires_at(self, stream_url: str) -> float:
+        """Usa o parâmetro `expire` das URLs assinadas quando disponível."""
+        try:
+            expire = parse_qs(urlparse(stream_url).query).get("expire")
+            if expire:
+                return float(expire[0]) - self.safety_margin
+        except (TypeError, ValueError):
+            pass
+        return time.time() + self.default_ttl
+
+    def _extract(self, url: str, pending: Dict[str, Future]) -> Optional[str]:
+        try:
+            info = self._get_ydl().extract_info(url, download=False)
+            stream_url = info.get("url")
+            if stream_url:
+                with self.lock:
+                    self._cache[url] = (stream_url, self._expires_at(stream_url))
+            return stream_url
+        except Exception as e:
+            print(f"Erro ao obter URL de streaming: {e}")
+            return None
+        finally:
+            with self.lock:
+                pending.pop(url, None)
+
+    # ============================================================
+    # API
+    # ============================================================
+    def cached(self, url: str) -> Optional[str]:
+        with self.lock:
+            item = self._cache.get(url)
+            if item and item[1] > time.time():
+                return item[0]
+            self._cache.pop(url, None)
+        return None
+
+    def _drop_speculative_locked(self) -> None:
+        """Cancela as resoluções especulativas que ainda não começaram."""
+        for url, future in list(self._pending.items()):
+            if future.cancel():
+                del self._pending[url]
+
+    def _submit_tap(self, url: str) -> Future:
+        with self.lock:
+            future = self._taps.get(url)
+            if future is not None:
+                return future
+            speculative = self._pending.get(url)
+            if speculative is not None and not speculative.cancel():
+                # Já está sendo extraída: basta esperar por ela
+                return speculative
+            self._pending.pop(url, None)
+            self._drop_speculative_locked()
+            future = self._tap_pool.submit(self._extract, url, self._taps)
+            self._taps[url] = future
+            return future
+
+    def resolve(self, url: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Retorna a URL de streaming, aguardando a resolução se necessário."""
+        stream_url = self.cached(url)
+        if stream_url:
+            return stream_url
+        try:
+            return self._submit_tap(url).result(timeout=timeout)
+        except Exception:
+            return None
+
+    def preresolve(self, urls: Iterable[str]) -> None:
+        """Resolve especulativamente em segundo plano, sem exceder max_pending."""
+        for url in urls:
+            if not url or self.cached(url):
+                continue
+            with self.lock:
+                if url in self._pending or url in self._taps:
+                    continue
+                if len(self._pending) >= self.max_pending:
+                    return
+                self._pending[url] = self._pool.submit(
+                    self._extract, url, self._pending
+                )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self._tap_pool.shutdown(wait=False)
@@ -0,0 +1,130 @@
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+# Linhas de progresso legíveis por máquina emitidas pelo yt-dlp (--newline)
+DOWNLOAD_MARKER = "SNAPDL-DL"
+POSTPROCESS_MARKER = "SNAPDL-PP"
+PROGRESS_TEMPLATE_ARGS = [
+    "--newline",
+    "--progress-template",
+    f"download:{DOWNLOAD_MARKER}|%(progress.status)s"
+    "|%(progress.downloaded_bytes)s|%(progress.total_bytes)s"
+    "|%(progress.total_bytes_estimate)s|%(progress.speed)s|%(progress.eta)s"
+    "|%(progress.fragment_index)s|%(progress.fragment_count)s",
+    "--progress-template",
+    f"postprocess:{POSTPROCESS_MARKER}"
+    "|%(progress.postprocessor)s|%(progress.status)s",
+]
+
+DOWNLOAD_FIELDS = (
+    "downloaded_bytes",
+    "total_bytes",
+    "total_bytes_estimate",
+    "speed",
+    "eta",
+    "fragment_index",
+    "fragment_count",
+)
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None  # "NA" quando o yt-dlp não conhece o valor
+
+
+def parse_progress_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Converte uma linha do --progress-template num dict no mesmo formato dos
+    progress_hooks (status "downloading") ou dos postprocessor_hooks.
+    """
+    line = line.strip()
+    if line.startswith(DOWNLOAD_MARKER + "|"):
+        values = line.split("|")[1:]
+        if len(values) != len(DOWNLOAD_FIELDS) + 1:
+            return None
+        d: Dict[str, Any] = {"status": values[0]}
+        d.update(zip(DOWNLOAD_FIELDS, (_number(v) for v in values[1:])))
+        return d
+    if line.startswith(POSTPROCESS_MARKER + "|"):
+        values = line.split("|")[1:]
+        if len(values) != 2:
+            return None
+        return {"postprocessor": values[0], "status": values[1]}
+    return None
+
+
+class TransferTelemetry:
+    """
+    Acompanha bytes, velocidade instantânea e suavizada (média móvel
+    exponencial), ETA e fragmentos de cada download, além da vazão
+    agregada da fila e por host.
+    """
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self.lock = Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def update(self, download_id: str, host: str, d: Dict[str, Any]) -> Dict[str, Any]:
+        """Atualiza com um dict de progress_hook e retorna as métricas atuais."""
+        now = time.monotonic()
+        done = d.get("downloaded_bytes")
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        with self.lock:
+            stats = self._stats.setdefault(
+                download_id,
+                {"host": host, "speed_avg": None, "last_bytes": None, "last_time": now},
+            )
+            speed = d.get("speed")
+            # Velocidade instantânea pelos bytes desde a última leitura
+            if done is not None and stats["last_bytes"] is not None:
+                elapsed = now - stats["last_time"]
+                if elapsed > 0 and done >= stats["last_bytes"]:
+                    speed = (done - stats["last_bytes"]) / elapsed
+            if done is not None:
+                stats["last_bytes"] = done
+                stats["last_time"] = now
+            if speed is not None:
+                avg = stats["speed_avg"]
+                stats["speed_avg"] = (
+                    speed if avg is None else avg + self.smoothing * (speed - avg)
+                )
+            stats["speed"] = speed
+            eta = d.get("eta")
+            if total and done is not None and stats["speed_avg"]:
+                eta = max(0.0, (total - done) / stats["speed_avg"])
+            stats.update(
+                {
+                    "downloaded_bytes": done,
+                    "total_bytes": total,
+                    "eta": eta,
+                    "fragment_index": d.get("fragment_index"),
+                    "fragment_count": d.get("fragment_count"),
+                }
+            )
+            return dict(stats)
+
+    def get(self, download_id: str) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self._stats.get(download_id, {}))
+
+    def finish(self, download_id: str) -> None:
+        with self.lock:
+            self._stats.pop(download_id, None)
+
+    def throughput(self) -> Dict[str, Any]:
+        """Vazão agregada da fila e por host, em bytes por segundo."""
+        with self.lock:
+            stats: List[Dict[str, Any]] = list(self._stats.values())
+        by_host: Dict[str, float] = {}
+        for s in stats:
+            by_host[s["host"]] = by_host.get(s["host"], 0.0) + (s["speed_avg"] or 0.0)
+        return {
+            "active": len(stats),
+            "speed": sum(s["speed_avg"] or 0.0 for s in stats),
+            "downloaded_bytes": sum(s["downloaded_bytes"] or 0 for s in stats),
+            "by_host": by_host,
+        }
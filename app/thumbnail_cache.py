@@ -0,0 +1,250 @@
+import os
+import io
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+from .paths import app_data_dir
+
+# O índice é regravado no máximo a cada tantas imagens ou segundos
+INDEX_SAVE_EVERY = 32
+INDEX_SAVE_INTERVAL = 5.0
+
+
+class ThumbnailCache:
+    """
+    Cache local de thumbnails. As imagens são baixadas em paralelo com um
+    cliente HTTP compartilhado, reduzidas ao tamanho do card e gravadas com
+    o hash do conteúdo como nome, com remoção LRU por tamanho total. O
+    tamanho e a ordem de uso dos blobs ficam em memória: o diretório só é
+    varrido uma vez, na abertura.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = 100 * 1024 * 1024,
+        max_workers: int = 6,
+        timeout: float = 10.0,
+    ):
+        self.cache_dir = cache_dir or app_data_dir("cache", "thumbnails")
+        self.blob_dir = os.path.join(self.cache_dir, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.lock = Lock()
+        self._index: Dict[str, str] = self._load_index()
+        self._blobs: "OrderedDict[str, int]" = self._scan_blobs()  # LRU: blob -> bytes
+        self._total = sum(self._blobs.values())
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._pending: Dict[str, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._client = None
+
+    # ============================================================
+    # ÍNDICE (chave -> blob)
+    # ============================================================
+    def _load_index(self) -> Dict[str, str]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        tmp = f"{self.index_path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            pass
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def _scan_blobs(self) -> "OrderedDict[str, int]":
+        """Tamanho dos blobs em disco, do menos para o mais recentemente usado."""
+        try:
+            with os.scandir(self.blob_dir) as it:
+                stats = [(e.name, e.stat()) for e in it if e.name.endswith(".jpg")]
+        except OSError:
+            return OrderedDict()
+        stats.sort(key=lambda item: item[1].st_mtime)
+        return OrderedDict((name, st.st_size) for name, st in stats)
+
+    @staticmethod
+    def _key(url: str, width: int, height: int) -> str:
+        return f"{width}x{height}:{url}"
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.blob_dir, blob)
+
+    # ============================================================
+    # HTTP E REDIMENSIONAMENTO
+    # ============================================================
+    def _get_client(self):
+        # Sob o lock: os workers do pool não podem criar um cliente cada
+        with self.lock:
+            if self._client is None:
+                import httpx
+
+                self._client = httpx.Client(
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+                )
+            return self._client
+
+    @staticmethod
+    def _variant_url(url: str, width: int) -> str:
+        """Para cards pequenos usa a variante 320x180 do YouTube em vez da hq720."""
+        parsed = urlparse(url)
+        if parsed.hostname and parsed.hostname.endswith("ytimg.com") and width <= 320:
+            parts = parsed.path.split("/")
+            if len(parts) >= 4 and parts[1] == "vi":
+                return f"https://i.ytimg.com/vi/{parts[2]}/mqdefault.jpg"
+        return url
+
+    @staticmethod
+    def _resize(data: bytes, width: int, height: int) -> bytes:
+        # Importado só aqui: o Pillow não pesa na abertura do app
+        try:
+            from PIL import Image
+        except ImportError:  # instalação sem Pillow: as imagens são salvas como vieram
+            return data
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if img.width <= width and img.height <= height:
+                    return data
+                img = img.convert("RGB")
+                img.thumbnail((width, height))
+                out = io.BytesIO()
+                img.save(out, format="JPEG", quality=85, optimize=True)
+                return out.getvalue()
+        except Exception:
+            return data
+
+    # ============================================================
+    # ARMAZENAMENTO
+    # ============================================================
+    def _store(self, key: str, data: bytes) -> str:
+        blob = hashlib.sha256(data).hexdigest() + ".jpg"
+        path = self._blob_path(blob)
+        if not os.path.exists(path):
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self.lock:
+            self._index[key] = blob
+            if blob not in self._blobs:
+                self._total += len(data)
+            self._blobs[blob] = len(data)
+            self._blobs.move_to_end(blob)
+            self._unsaved += 1
+            if self._total > self.max_bytes:
+                self._evict_locked()
+            elif (
+                self._unsaved >= INDEX_SAVE_EVERY
+                or time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL
+            ):
+                self._save_index()
+        return path
+
+    def _evict_locked(self) -> None:
+        """Remove os blobs menos usados até caber no limite de bytes."""
+        removed = set()
+        while self._total > self.max_bytes and len(self._blobs) > 1:
+            blob, size = self._blobs.popitem(last=False)
+            try:
+                os.remove(self._blob_path(blob))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            removed.add(blob)
+            self._total -= size
+        for key in [k for k, b in self._index.items() if b in removed]:
+            del self._index[key]
+        self._save_index()
+
+    # ============================================================
+    # API
+    # ============================================================
+    def get(self, url: str, width: int, height: int) -> Optional[str]:
+        """Caminho local da thumbnail, se já estiver em cache (sem rede)."""
+        with self.lock:
+            blob = self._index.get(self._key(url, width, height))
+            if blob in self._blobs:
+                self._blobs.move_to_end(blob)
+        if not blob:
+            return None
+        path = self._blob_path(blob)
+        try:
+            os.utime(path)  # marca como usado recentemente
+        except OSError:
+            # Blob apagado por fora: esquece a entrada para poder baixar de novo
+            with self.lock:
+                if self._index.get(self._key(url, width, height)) == blob:
+                    del self._index[self._key(url, width, height)]
+                    self._unsaved += 1
+                size = self._blobs.pop(blob, None)
+                if size is not None:
+                    self._total -= size
+            return None
+        return path
+
+    def fetch(self, url: str, width: int, height: int) -> Optional[str]:
+        """Baixa, reduz e grava a thumbnail; bloqueia até terminar."""
+        cached = self.get(url, width, height)
+        if cached:
+            return cached
+        try:
+            response = self._get_client().get(self._variant_url(url, width))
+            response.raise_for_status()
+            data = self._resize(response.content, width, height)
+            return self._store(self._key(url, width, height), data)
+        except Exception as e:
+            print(f"[ThumbnailCache] Falha ao baixar {url}: {e}")
+            return None
+
+    def prefetch(self, urls: Iterable[str], width: int, height: int) -> None:
+        """Agenda o download em segundo plano das thumbnails que faltam."""
+        for url in urls:
+            if not url:
+                continue
+            key = self._key(url, width, height)
+            with self.lock:
+                if key in self._index or key in self._pending:
+                    continue
+                future = self._pool.submit(self.fetch, url, width, height)
+                self._pending[key] = future
+            future.add_done_callback(lambda _, k=key: self._done(k))
+
+    def _done(self, key: str) -> None:
+        with self.lock:
+            self._pending.pop(key, None)
+
+    def source(self, url: str, width: int, height: int) -> str:
+        """Fonte para ft.Image: o arquivo local quando existe, senão a URL remota."""
+        if not url:
+            return url
+        cached = self.get(url, width, height)
+        if cached:
+            return cached
+        self.prefetch([url], width, height)
+        return url
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        with self.lock:
+            if self._unsaved:
+                self._save_index()
+        if self._client is not None:
+            self._client.close()
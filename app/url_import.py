@@ -0,0 +1,88 @@
+import os
+import re
+import json
+from typing import Any, Dict, Iterable, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+URL_RE = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+
+# Campos aproveitados de cada item importado (o resto é ignorado)
+ITEM_FIELDS = (
+    "url",
+    "title",
+    "uploader",
+    "thumbnail",
+    "duration",
+    "duration_seconds",
+    "formats",
+)
+
+
+def url_key(url: str) -> str:
+    """
+    Chave canônica de um link, para detectar duplicatas: vídeos do YouTube
+    viram "youtube:<id>" (watch, youtu.be, shorts...), o resto perde
+    esquema, "www." e fragmento.
+    """
+    url = url.strip()
+    if not re.match(r"^https?://", url, re.IGNORECASE):
+        url = "https://" + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host.endswith(YOUTUBE_HOSTS):
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+        if not video_id and host == "youtu.be":
+            video_id = parsed.path.strip("/").split("/")[0]
+        if not video_id:
+            match = re.match(r"^/(?:shorts|embed|live|v)/([\w-]+)", parsed.path)
+            video_id = match.group(1) if match else None
+        if video_id:
+            return f"youtube:{video_id}"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{host}{parsed.path.rstrip('/')}{query}"
+
+
+def parse_url_list(text: str) -> List[Dict[str, Any]]:
+    """Um link por linha; linhas vazias e comentários (#) são ignorados."""
+    items = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = URL_RE.search(line)
+        if match:
+            items.append({"url": match.group(0)})
+    return items
+
+
+def _normalize(item: Union[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if isinstance(item, str):
+        return {"url": item.strip()} if item.strip() else None
+    if isinstance(item, dict) and item.get("url"):
+        return {k: item[k] for k in ITEM_FIELDS if item.get(k) is not None}
+    return None
+
+
+def normalize_items(items: Iterable[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Aceita links soltos ou dicts (resultados de busca, metadados em lote)."""
+    return [item for item in map(_normalize, items) if item]
+
+
+def load_import_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Lê uma lista de links de um arquivo: texto (um por linha) ou JSON, seja
+    uma lista de links/itens ou um resultado de busca exportado
+    (`{"results": [...]}`, como assets/result_placeholder.json).
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        content = f.read()
+    if os.path.splitext(path)[1].lower() != ".json":
+        return parse_url_list(content)
+    data = json.loads(content)
+    if isinstance(data, dict):
+        data = data.get("results") or data.get("entries") or data.get("items") or []
+    return normalize_items(data if isinstance(data, list) else [])
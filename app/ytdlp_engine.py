@@ -0,0 +1,191 @@
+import importlib.util
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def options_to_args(opts: Dict[str, Any]) -> List[str]:
+    """Converte as opções da API do yt-dlp nos argumentos de linha de comando."""
+    args: List[str] = []
+    if opts.get("format"):
+        args += ["-f", opts["format"]]
+    if opts.get("merge_output_format"):
+        args += ["--merge-output-format", opts["merge_output_format"]]
+    for pp in opts.get("postprocessors", []):
+        if pp.get("key") == "FFmpegExtractAudio":
+            args += ["-x", "--audio-format", pp.get("preferredcodec", "best")]
+        elif pp.get("key") == "FFmpegVideoRemuxer":
+            args += ["--remux-video", pp["preferedformat"]]
+    if opts.get("concurrent_fragment_downloads"):
+        args += ["-N", str(opts["concurrent_fragment_downloads"])]
+    if opts.get("http_chunk_size"):
+        args += ["--http-chunk-size", str(opts["http_chunk_size"])]
+    if opts.get("buffersize"):
+        args += ["--buffer-size", str(opts["buffersize"])]
+    for proto, name in opts.get("external_downloader", {}).items():
+        args += ["--downloader", name if proto == "default" else f"{proto}:{name}"]
+    for name, extra in opts.get("external_downloader_args", {}).items():
+        args += ["--downloader-args", f"{name}:{' '.join(extra)}"]
+    if opts.get("ratelimit"):
+        args += ["--limit-rate", str(int(opts["ratelimit"]))]
+    if opts.get("updatetime") is False:
+        args.append("--no-mtime")
+    if opts.get("outtmpl"):
+        args += ["-o", opts["outtmpl"]]
+    return args
+
+
+class YtDlpEngine:
+    """
+    Executa downloads dentro do próprio processo, reaproveitando instâncias
+    de YoutubeDL já aquecidas em vez de abrir um yt-dlp por download. No
+    máximo `max_idle` instâncias ficam ociosas, somando todas as combinações
+    de opções; as usadas há mais tempo são fechadas primeiro.
+    """
+
+    # Opções que mudam a cada download e não exigem uma instância nova.
+    # "format" é a exceção que o yt-dlp não relê: o seletor é montado no
+    # construtor, então download() o recria a cada chamada (_set_format)
+    PER_CALL_KEYS = ("outtmpl", "ratelimit", "format", "merge_output_format")
+
+    def __init__(self, max_idle: int = 4):
+        self.max_idle = max(1, max_idle)
+        self.lock = Lock()
+        self._idle: Dict[Tuple, List[Tuple[Any, Dict[str, Any]]]] = {}
+        self._running: Dict[str, Any] = {}
+
+    @staticmethod
+    def is_available() -> bool:
+        return importlib.util.find_spec("yt_dlp") is not None
+
+    # ============================================================
+    # POOL DE INSTÂNCIAS
+    # ============================================================
+    def _key(self, opts: Dict[str, Any]) -> Tuple:
+        return tuple(
+            sorted(
+                (k, repr(v)) for k, v in opts.items() if k not in self.PER_CALL_KEYS
+            )
+        )
+
+    def _create(self, opts: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        from yt_dlp import YoutubeDL
+
+        # O hook consulta o "holder" para saber qual download está ativo
+        holder: Dict[str, Any] = {"on_progress": None, "on_postprocess": None}
+
+        def hook(d: Dict[str, Any]) -> None:
+            cb = holder["on_progress"]
+            if callable(cb):
+                cb(d)
+
+        def pp_hook(d: Dict[str, Any]) -> None:
+            cb = holder["on_postprocess"]
+            if callable(cb):
+                cb(d)
+
+        params = {k: v for k, v in opts.items() if k not in self.PER_CALL_KEYS}
+        params.update(
+            {
+                "quiet": True,
+                "noprogress": True,
+                "no_warnings": True,
+                "progress_hooks": [hook],
+                "postprocessor_hooks": [pp_hook],
+            }
+        )
+        return YoutubeDL(params), holder
+
+    def _acquire(self, opts: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        key = self._key(opts)
+        with self.lock:
+            pool = self._idle.get(key)
+            if pool:
+                return pool.pop()
+        return self._create(opts)
+
+    def _release(self, opts: Dict[str, Any], instance: Tuple[Any, Dict[str, Any]]):
+        key = self._key(opts)
+        evicted = []
+        with self.lock:
+            # A combinação usada por último vai para o fim da ordem de descarte
+            pool = self._idle.pop(key, [])
+            pool.append(instance)
+            self._idle[key] = pool
+            while sum(len(p) for p in self._idle.values()) > self.max_idle:
+                oldest = next(iter(self._idle))
+                evicted.append(self._idle[oldest].pop(0))
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+        for ydl, _ in evicted:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _set_format(ydl: Any, opts: Dict[str, Any]) -> None:
+        """Aplica format/merge_output_format numa instância reaproveitada."""
+        fmt = opts.get("format")
+        # merge_output_format entra na montagem do seletor, então vem antes
+        ydl.params["merge_output_format"] = opts.get("merge_output_format")
+        ydl.params["format"] = fmt
+        # Mesma regra do YoutubeDL.__init__: None/"-" usam o padrão do yt-dlp
+        if fmt in (None, "-") or callable(fmt):
+            ydl.format_selector = fmt
+        else:
+            ydl.format_selector = ydl.build_format_selector(fmt)
+
+    # ============================================================
+    # DOWNLOAD
+    # ============================================================
+    def download(
+        self,
+        url: str,
+        opts: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_postprocess: Optional[Callable[[Dict[str, Any]], None]] = None,
+        job_id: Optional[str] = None,
+    ) -> None:
+        """Baixa a URL; levanta exceção em caso de falha."""
+        ydl, holder = instance = self._acquire(opts)
+        try:
+            holder["on_progress"] = on_progress
+            holder["on_postprocess"] = on_postprocess
+            ydl.params["outtmpl"] = {"default": opts["outtmpl"]}
+            ydl.params["ratelimit"] = opts.get("ratelimit")
+            self._set_format(ydl, opts)
+            if job_id:
+                with self.lock:
+                    self._running[job_id] = ydl
+            ydl.extract_info(url, download=True)
+        finally:
+            if job_id:
+                with self.lock:
+                    self._running.pop(job_id, None)
+            holder["on_progress"] = None
+            holder["on_postprocess"] = None
+            self._release(opts, instance)
+
+    def set_rate_limit(self, job_id: str, ratelimit: Optional[float]) -> bool:
+        """
+        Altera o limite de banda de um download em andamento. O downloader
+        HTTP relê o parâmetro a cada bloco; downloads fragmentados já
+        iniciados podem manter o limite anterior.
+        """
+        with self.lock:
+            ydl = self._running.get(job_id)
+            if ydl is None:
+                return False
+            ydl.params["ratelimit"] = ratelimit
+        return True
+
+    def close(self) -> None:
+        with self.lock:
+            pools = list(self._idle.values())
+            self._idle.clear()
+        for pool in pools:
+            for ydl, _ in pool:
+                try:
+                    ydl.close()
+                except Exception:
+                    pass